@@ -1,8 +1,20 @@
+"""
+目标检测与运动检测
+
+调用约定：MotionDetector 用于在 AI 推理前做门控，调用方应先执行
+MotionDetector.detect(...)，仅在返回 has_motion 为 True 时再调用
+ObjectDetector.detect(regions=运动区域)；ObjectDetector.detect_with_motion 封装了这一流程
+"""
+
+import functools
 import logging
 import os
+import platform
+import queue
+import threading
 import time
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Iterable, Iterator
 
 import numpy as np
 import cv2
@@ -94,6 +106,21 @@ COCO_LABELS = [
 ]
 
 
+# ONNX 张量类型到 numpy 类型的映射（支持 FP32 与 FP16 导出的模型）
+ONNX_TENSOR_TYPES: dict[str, Any] = {
+    "tensor(float)": np.float32,
+    "tensor(float16)": np.float16,
+}
+
+
+# Coral Edge TPU delegate 动态库名称
+EDGETPU_SHARED_LIB = {
+    "Linux": "libedgetpu.so.1",
+    "Darwin": "libedgetpu.1.dylib",
+    "Windows": "edgetpu.dll",
+}
+
+
 class ModelBackend(ABC):
     """
     模型推理后端抽象接口
@@ -120,6 +147,13 @@ class ModelBackend(ABC):
         """执行推理，返回原始输出"""
         pass
 
+    def get_input_buffer(self) -> np.ndarray | None:
+        """
+        返回后端持有的持久输入缓冲区，预处理可直接写入以省去一次拷贝
+        不支持时返回 None
+        """
+        return None
+
 
 class ONNXBackend(ModelBackend):
     """
@@ -127,11 +161,49 @@ class ONNXBackend(ModelBackend):
     使用 onnxruntime 库加载和执行 ONNX 格式模型
     """
 
-    def __init__(self):
+    # 同一模型（及设备）在进程内只创建一个会话，多个检测器共用同一线程池，避免线程超订
+    _session_cache: dict[tuple[str, str], Any] = {}
+    _session_cache_lock = threading.Lock()
+    # 0 表示由 onnxruntime 按物理核数决定；单分支检测网络的算子间并行收益很小
+    intra_op_num_threads = 0
+    inter_op_num_threads = 1
+
+    @classmethod
+    def configure_threads(cls, cameras: int = 1, intra_op_threads: int = 0) -> None:
+        """
+        按并发推理的摄像头数划分算子内线程数，需在首次加载模型前调用
+        intra_op_threads > 0 时直接使用该值
+        """
+        if intra_op_threads > 0:
+            cls.intra_op_num_threads = intra_op_threads
+        else:
+            cls.intra_op_num_threads = max(1, (os.cpu_count() or 4) // max(1, cameras))
+        cls.inter_op_num_threads = 1
+
+    @staticmethod
+    def gpu_providers_available() -> bool:
+        """当前 onnxruntime 是否提供 TensorRT / CUDA 后端（auto 时会优先选用）"""
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            return False
+        available = ort.get_available_providers()
+        return (
+            "TensorrtExecutionProvider" in available
+            or "CUDAExecutionProvider" in available
+        )
+
+    def __init__(self, device: str = "auto"):
         self.session = None
+        self.device = device  # auto / cpu / cuda
         self.input_name: str = ""
         self.input_shape: tuple = (1, 3, 640, 640)
+        self.input_dtype: Any = np.float32
         self._is_ready = False
+        # IOBinding 相关：输入输出绑定到持久的 numpy 缓冲区，避免每帧分配
+        self._io_binding: Any = None
+        self._input_buf: np.ndarray | None = None
+        self._output_buf: np.ndarray | None = None
 
     def load(self, model_path: str) -> bool:
         try:
@@ -140,25 +212,26 @@ class ONNXBackend(ModelBackend):
             slog.info(f"加载 ONNX 模型: {model_path} ...")
             start_time = time.time()
 
-            sess_options = ort.SessionOptions()
-            sess_options.graph_optimization_level = (
-                ort.GraphOptimizationLevel.ORT_ENABLE_ALL
-            )
-            sess_options.intra_op_num_threads = 4
-            sess_options.inter_op_num_threads = 2
-
-            providers = ["CPUExecutionProvider"]
-            self.session = ort.InferenceSession(
-                model_path, sess_options=sess_options, providers=providers
-            )
+            key = (os.path.abspath(model_path), self.device)
+            with ONNXBackend._session_cache_lock:
+                self.session = ONNXBackend._session_cache.get(key)
+                if self.session is None:
+                    self.session = self._create_session(ort, model_path)
+                    ONNXBackend._session_cache[key] = self.session
+                else:
+                    slog.info("复用已加载的 ONNX 会话")
 
             input_info = self.session.get_inputs()[0]
             self.input_name = input_info.name
             self.input_shape = tuple(input_info.shape)
+            self.input_dtype = ONNX_TENSOR_TYPES.get(input_info.type, np.float32)
+
+            self._setup_io_binding(ort)
 
             elapsed = time.time() - start_time
             slog.info(
-                f"ONNX 模型加载完成 (耗时: {elapsed:.2f}s, 输入形状: {self.input_shape})"
+                f"ONNX 模型加载完成 (耗时: {elapsed:.2f}s, 输入形状: {self.input_shape}, "
+                f"输入类型: {input_info.type}, 后端: {self.session.get_providers()})"
             )
             self._is_ready = True
             return True
@@ -169,15 +242,152 @@ class ONNXBackend(ModelBackend):
             slog.error(f"加载 ONNX 模型失败: {e}")
             return False
 
+    def _create_session(self, ort: Any, model_path: str) -> Any:
+        """创建推理会话"""
+        sess_options = ort.SessionOptions()
+        sess_options.graph_optimization_level = (
+            ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        sess_options.intra_op_num_threads = self.intra_op_num_threads
+        sess_options.inter_op_num_threads = self.inter_op_num_threads
+        # 固定输入形状时内存规划可在多次推理间复用；单分支的检测网络顺序执行即可
+        sess_options.enable_mem_pattern = True
+        sess_options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+
+        providers = self._select_providers(ort, model_path)
+        return ort.InferenceSession(
+            model_path, sess_options=sess_options, providers=providers
+        )
+
+    def _select_providers(self, ort: Any, model_path: str) -> list:
+        """
+        根据 device 选择执行后端，按 TensorRT > CUDA > CPU 的顺序使用可用的后端
+        auto/cuda: 优先使用 GPU（cuda 时不可用会告警），cpu: 仅 CPU
+        TensorRT 启用 FP16 并把构建好的引擎缓存到模型同目录的 trt_cache 下，避免每次启动重新构建
+        """
+        if self.device == "cpu":
+            return ["CPUExecutionProvider"]
+
+        available = ort.get_available_providers()
+        providers: list = []
+        if "TensorrtExecutionProvider" in available:
+            cache_path = os.path.join(
+                os.path.dirname(os.path.abspath(model_path)), "trt_cache"
+            )
+            providers.append(
+                (
+                    "TensorrtExecutionProvider",
+                    {
+                        "device_id": 0,
+                        "trt_fp16_enable": True,
+                        "trt_engine_cache_enable": True,
+                        "trt_engine_cache_path": cache_path,
+                    },
+                )
+            )
+        if "CUDAExecutionProvider" in available:
+            providers.append(
+                (
+                    "CUDAExecutionProvider",
+                    {"device_id": 0, "cudnn_conv_algo_search": "EXHAUSTIVE"},
+                )
+            )
+
+        if not providers and self.device == "cuda":
+            slog.warning("当前 onnxruntime 不支持 CUDAExecutionProvider，回退到 CPU")
+        providers.append("CPUExecutionProvider")
+        return providers
+
+    def _setup_io_binding(self, ort: Any) -> None:
+        """
+        输入形状固定时，预分配输入/输出缓冲区并通过 IOBinding 绑定到会话
+        仅 batch 维为动态的模型按 batch=1 绑定（单帧检测路径），多图批量推理走 session.run
+        其他维度为动态形状的模型无法预分配，继续使用 session.run
+        """
+        self._io_binding = None
+        self._input_buf = None
+        self._output_buf = None
+
+        def _is_static(dims) -> bool:
+            return all(isinstance(d, int) and d > 0 for d in dims)
+
+        if not _is_static(self.input_shape[1:]):
+            slog.info("ONNX 模型输入为动态形状，不启用 IOBinding")
+            return
+        if self.session.get_inputs()[0].type not in ONNX_TENSOR_TYPES:
+            return
+
+        try:
+            bind_shape = self.input_shape
+            if not _is_static(bind_shape):
+                bind_shape = (1,) + tuple(bind_shape[1:])
+            self._input_buf = np.zeros(bind_shape, dtype=self.input_dtype)
+            io_binding = self.session.io_binding()
+            io_binding.bind_ortvalue_input(
+                self.input_name,
+                ort.OrtValue.ortvalue_from_numpy(self._input_buf, "cpu", 0),
+            )
+
+            outputs = self.session.get_outputs()
+            output_shape = outputs[0].shape
+            if outputs[0].type in ONNX_TENSOR_TYPES and not _is_static(output_shape):
+                # 输出含符号维度时用 batch=1 试跑一次得到实际形状
+                probe = self.session.run(
+                    [outputs[0].name], {self.input_name: self._input_buf}
+                )
+                output_shape = probe[0].shape
+            if outputs[0].type in ONNX_TENSOR_TYPES:
+                self._output_buf = np.empty(
+                    output_shape, dtype=ONNX_TENSOR_TYPES[outputs[0].type]
+                )
+                io_binding.bind_ortvalue_output(
+                    outputs[0].name,
+                    ort.OrtValue.ortvalue_from_numpy(self._output_buf, "cpu", 0),
+                )
+            else:
+                io_binding.bind_output(outputs[0].name, "cpu")
+            for output in outputs[1:]:
+                io_binding.bind_output(output.name, "cpu")
+
+            self._io_binding = io_binding
+        except Exception as e:
+            slog.warning(f"初始化 IOBinding 失败，回退到 session.run: {e}")
+            self._io_binding = None
+            self._input_buf = None
+            self._output_buf = None
+
     def is_ready(self) -> bool:
         return self._is_ready and self.session is not None
 
     def get_input_shape(self) -> tuple:
         return self.input_shape
 
+    def get_input_buffer(self) -> np.ndarray | None:
+        return self._input_buf
+
     def infer(self, input_tensor: np.ndarray) -> np.ndarray:
+        """
+        执行推理，返回第一个输出张量
+        启用 IOBinding 时返回的是复用的输出缓冲区，下一次推理前需处理完
+        """
         if not self.session:
             raise RuntimeError("ONNX 模型未加载")
+
+        if (
+            self._io_binding is not None
+            and self._input_buf is not None
+            and input_tensor.shape == self._input_buf.shape
+        ):
+            if input_tensor is not self._input_buf:
+                np.copyto(self._input_buf, input_tensor)
+            self.session.run_with_iobinding(self._io_binding)
+            if self._output_buf is not None:
+                return self._output_buf
+            return np.asarray(self._io_binding.copy_outputs_to_cpu()[0])
+
+        # FP16 导出的模型需要 float16 输入
+        if input_tensor.dtype != self.input_dtype:
+            input_tensor = input_tensor.astype(self.input_dtype)
         outputs = self.session.run(None, {self.input_name: input_tensor})
         return np.asarray(outputs[0])
 
@@ -203,16 +413,18 @@ class TFLiteBackend(ModelBackend):
     def load(self, model_path: str) -> bool:
         try:
             Interpreter = None
+            load_delegate = None
             try:
-                from tflite_runtime.interpreter import Interpreter  # type: ignore
+                from tflite_runtime.interpreter import Interpreter, load_delegate  # type: ignore
             except ImportError:
                 try:
-                    from ai_edge_litert.interpreter import Interpreter  # type: ignore
+                    from ai_edge_litert.interpreter import Interpreter, load_delegate  # type: ignore
                 except ImportError:
                     try:
                         import tensorflow as tf
 
                         Interpreter = tf.lite.Interpreter
+                        load_delegate = tf.lite.experimental.load_delegate
                     except ImportError:
                         pass
 
@@ -222,7 +434,13 @@ class TFLiteBackend(ModelBackend):
             slog.info(f"加载 TFLite 模型: {model_path} ...")
             start_time = time.time()
 
-            self.interpreter = Interpreter(model_path=model_path)
+            # 显式指定线程数，内置的 XNNPACK（tflite-runtime 2.11+ 默认启用）才会用满多核
+            delegates = self._load_delegates(model_path, load_delegate)
+            self.interpreter = Interpreter(
+                model_path=model_path,
+                experimental_delegates=delegates or None,
+                num_threads=os.cpu_count() or 4,
+            )
             self.interpreter.allocate_tensors()
 
             self.input_details = self.interpreter.get_input_details()
@@ -262,6 +480,29 @@ class TFLiteBackend(ModelBackend):
             slog.error(f"加载 TFLite 模型失败: {e}")
             return False
 
+    @staticmethod
+    def _load_delegates(model_path: str, load_delegate: Any) -> list:
+        """
+        加载硬件加速 delegate
+        文件名包含 _edgetpu 的模型（edgetpu_compiler 的输出命名）使用 Coral Edge TPU
+        """
+        if "_edgetpu" not in os.path.basename(model_path).lower():
+            return []
+        if load_delegate is None:
+            slog.warning(
+                "当前 TFLite 运行时不支持加载 delegate，Edge TPU 模型可能无法运行"
+            )
+            return []
+
+        lib = EDGETPU_SHARED_LIB.get(platform.system(), "libedgetpu.so.1")
+        try:
+            delegate = load_delegate(lib)
+            slog.info(f"已加载 Edge TPU delegate: {lib}")
+            return [delegate]
+        except Exception as e:
+            slog.warning(f"加载 Edge TPU delegate 失败 ({lib}): {e}")
+            return []
+
     def is_ready(self) -> bool:
         return self._is_ready and self.interpreter is not None
 
@@ -297,6 +538,11 @@ class TFLiteBackend(ModelBackend):
         self.interpreter.invoke()
 
         output = self.interpreter.get_tensor(self.output_details[0]["index"])
+        # 量化模型的输出为整型，需按输出量化参数反量化为浮点
+        if np.issubdtype(output.dtype, np.integer):
+            scale, zero_point = self.output_details[0].get("quantization", (0.0, 0))
+            if scale:
+                output = (output.astype(np.float32) - zero_point) * scale
         return np.asarray(output)
 
     def infer_ssd(
@@ -368,35 +614,287 @@ class TFLiteBackend(ModelBackend):
         return boxes, classes, scores, num_detections
 
 
+class TensorRTBackend(ModelBackend):
+    """
+    TensorRT 推理后端
+    加载预先构建的 .engine 文件，使用 pycuda 管理显存与 CUDA 流
+    主机端输入输出使用页锁定内存，预处理可直接写入输入缓冲区
+    """
+
+    def __init__(self):
+        self.engine: Any = None
+        self.context: Any = None
+        self.input_shape: tuple = (1, 3, 640, 640)
+        self._is_ready = False
+        self._cuda: Any = None
+        self._cuda_ctx: Any = None
+        self._stream: Any = None
+        self._use_v3 = True  # TensorRT >= 8.5 使用按名称绑定的 execute_async_v3
+        self._bindings: list[int] = []
+        self._host_input: np.ndarray | None = None
+        self._device_input: Any = None
+        self._host_output: np.ndarray | None = None
+        self._device_output: Any = None
+        self._device_buffers: list[Any] = []
+
+    def load(self, model_path: str) -> bool:
+        try:
+            import tensorrt as trt  # type: ignore
+            import pycuda.driver as cuda  # type: ignore
+
+            slog.info(f"加载 TensorRT 模型: {model_path} ...")
+            start_time = time.time()
+
+            cuda.init()
+            self._cuda = cuda
+            # CUDA 上下文与线程绑定，推理线程与加载线程不同，推理时需显式 push/pop
+            self._cuda_ctx = cuda.Device(0).make_context()
+            try:
+                trt_logger = trt.Logger(trt.Logger.WARNING)
+                with open(model_path, "rb") as f:
+                    runtime = trt.Runtime(trt_logger)
+                    self.engine = runtime.deserialize_cuda_engine(f.read())
+                if self.engine is None:
+                    raise RuntimeError("反序列化 TensorRT engine 失败")
+                self.context = self.engine.create_execution_context()
+                self._stream = cuda.Stream()
+                self._allocate_buffers(trt)
+            finally:
+                self._cuda_ctx.pop()
+
+            elapsed = time.time() - start_time
+            slog.info(
+                f"TensorRT 模型加载完成 (耗时: {elapsed:.2f}s, 输入形状: {self.input_shape})"
+            )
+            self._is_ready = True
+            return True
+        except ImportError:
+            slog.error("未安装 tensorrt 或 pycuda，无法加载 TensorRT 模型")
+            return False
+        except Exception as e:
+            slog.error(f"加载 TensorRT 模型失败: {e}")
+            return False
+
+    def _allocate_buffers(self, trt: Any) -> None:
+        """按 engine 的输入输出张量分配页锁定主机内存与显存"""
+        cuda = self._cuda
+        engine = self.engine
+
+        if hasattr(engine, "num_io_tensors"):
+            names = [engine.get_tensor_name(i) for i in range(engine.num_io_tensors)]
+            is_input = [
+                engine.get_tensor_mode(n) == trt.TensorIOMode.INPUT for n in names
+            ]
+            shapes = [tuple(engine.get_tensor_shape(n)) for n in names]
+            dtypes = [trt.nptype(engine.get_tensor_dtype(n)) for n in names]
+        else:
+            self._use_v3 = False
+            names = [engine.get_binding_name(i) for i in range(engine.num_bindings)]
+            is_input = [engine.binding_is_input(i) for i in range(engine.num_bindings)]
+            shapes = [tuple(engine.get_binding_shape(i)) for i in range(len(names))]
+            dtypes = [
+                trt.nptype(engine.get_binding_dtype(i)) for i in range(len(names))
+            ]
+
+        if any(d < 0 for shape in shapes for d in shape):
+            raise RuntimeError(f"仅支持静态形状的 TensorRT engine: {shapes}")
+
+        self._bindings = []
+        self._device_buffers = []
+        for name, inp, shape, dtype in zip(names, is_input, shapes, dtypes):
+            nbytes = int(trt.volume(shape)) * np.dtype(dtype).itemsize
+            device_mem = cuda.mem_alloc(nbytes)
+            self._device_buffers.append(device_mem)
+            self._bindings.append(int(device_mem))
+            if self._use_v3:
+                self.context.set_tensor_address(name, int(device_mem))
+
+            if inp and self._host_input is None:
+                self.input_shape = shape
+                self._host_input = cuda.pagelocked_empty(shape, dtype)
+                self._device_input = device_mem
+            elif not inp and self._host_output is None:
+                self._host_output = cuda.pagelocked_empty(shape, dtype)
+                self._device_output = device_mem
+
+        if self._host_input is None or self._host_output is None:
+            raise RuntimeError("TensorRT engine 缺少输入或输出张量")
+
+    def is_ready(self) -> bool:
+        return self._is_ready and self.context is not None
+
+    def get_input_shape(self) -> tuple:
+        return self.input_shape
+
+    def get_input_buffer(self) -> np.ndarray | None:
+        return self._host_input
+
+    def infer(self, input_tensor: np.ndarray) -> np.ndarray:
+        """
+        执行推理，返回第一个输出张量
+        返回的是复用的页锁定输出缓冲区，下一次推理前需处理完
+        """
+        if not self.context or self._host_input is None or self._host_output is None:
+            raise RuntimeError("TensorRT 模型未加载")
+
+        if input_tensor is not self._host_input:
+            np.copyto(self._host_input, input_tensor)
+
+        cuda = self._cuda
+        self._cuda_ctx.push()
+        try:
+            cuda.memcpy_htod_async(self._device_input, self._host_input, self._stream)
+            if self._use_v3:
+                self.context.execute_async_v3(self._stream.handle)
+            else:
+                self.context.execute_async_v2(self._bindings, self._stream.handle)
+            cuda.memcpy_dtoh_async(self._host_output, self._device_output, self._stream)
+            self._stream.synchronize()
+        finally:
+            self._cuda_ctx.pop()
+
+        return self._host_output
+
+
+@functools.lru_cache(maxsize=64)
+def letterbox_params(
+    h: int, w: int, target_size: int
+) -> tuple[float, int, int, int, int]:
+    """
+    按原图尺寸计算 letterbox 参数 (scale, new_w, new_h, left, top)
+    整帧尺寸每帧都会命中而留在缓存中；运动区域裁剪的尺寸各异，LRU 上限避免缓存无限增长
+    """
+    scale = min(target_size / h, target_size / w)
+    new_h, new_w = int(h * scale), int(w * scale)
+    left = (target_size - new_w) // 2
+    top = (target_size - new_h) // 2
+    return scale, new_w, new_h, left, top
+
+
+def yolo_boxes_to_xyxy(
+    boxes: np.ndarray,
+    pad_w: float,
+    pad_h: float,
+    inv_scale: float,
+    orig_w: int,
+    orig_h: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    将 YOLO 输出的 (center_x, center_y, w, h) 框一次性换算到原图
+    先在 (n, 2) 的中心点与半宽高上完成去填充和缩放（乘以 inv_scale），再展开为角点，
+    最后裁剪到图像边界；返回 (xyxy, xywh)，xywh 供 NMS 使用
+    """
+    xyxy = np.empty((len(boxes), 4), dtype=np.float32)
+    center = boxes[:, 0:2] - (pad_w, pad_h)
+    center *= inv_scale
+    half = boxes[:, 2:4] * (0.5 * inv_scale)
+    np.subtract(center, half, out=xyxy[:, 0:2])
+    np.add(center, half, out=xyxy[:, 2:4])
+    np.clip(xyxy, 0, (orig_w, orig_h, orig_w, orig_h), out=xyxy)
+
+    xywh = xyxy.copy()
+    xywh[:, 2:4] -= xyxy[:, 0:2]
+    return xyxy, xywh
+
+
+# NMSBoxesBatched 自 OpenCV 4.7 起提供，发行版自带的旧版本回退到 NumPy 实现
+_HAS_NMS_BATCHED = hasattr(cv2.dnn, "NMSBoxesBatched")
+
+
+def nms_numpy(
+    boxes: np.ndarray, scores: np.ndarray, class_ids: np.ndarray, iou_threshold: float
+) -> np.ndarray:
+    """
+    按类别的贪心 NMS，boxes 为 (n, 4) xyxy，返回保留框的 int32 索引（按分数降序）
+    每轮取当前最高分框，一次性计算其与剩余框的 IoU，剔除同类别且 IoU 超过阈值的框
+    面积为 0 的框（裁剪到填充区内）不参与抑制，直接丢弃
+    """
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-scores, kind="stable")
+    order = order[areas[order] > 0]
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        inter_w = np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])
+        inter_h = np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])
+        inter = np.maximum(inter_w, 0) * np.maximum(inter_h, 0)
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-9)
+        order = rest[(iou <= iou_threshold) | (class_ids[rest] != class_ids[i])]
+    return np.asarray(keep, dtype=np.int32)
+
+
+def finalize_boxes(
+    xyxy: np.ndarray, orig_w: int, orig_h: int
+) -> tuple[list[list[int]], list[int], list[list[float]]]:
+    """
+    由整型 (n, 4) xyxy 框批量计算面积与归一化的 (中心 x, 中心 y, 宽, 高)
+    返回 Python 列表 (boxes, areas, norm_boxes)，供逐框组装结果字典
+    """
+    boxes = xyxy.astype(np.int64)
+    wh = boxes[:, 2:4] - boxes[:, 0:2]
+    size = np.array([orig_w, orig_h], dtype=np.float64)
+    norm = np.empty((len(boxes), 4), dtype=np.float64)
+    norm[:, 0:2] = (boxes[:, 0:2] + boxes[:, 2:4]) / 2 / size
+    norm[:, 2:4] = wh / size
+    return boxes.tolist(), (wh[:, 0] * wh[:, 1]).tolist(), norm.tolist()
+
+
 def get_model_type(model_path: str) -> str:
     """根据模型文件后缀判断模型类型"""
     ext = os.path.splitext(model_path)[1].lower()
-    return "tflite" if ext == ".tflite" else "onnx"
+    if ext == ".tflite":
+        return "tflite"
+    if ext in (".engine", ".trt"):
+        return "tensorrt"
+    return "onnx"
 
 
-def create_backend(model_type: str) -> ModelBackend:
+def create_backend(model_type: str, device: str = "auto") -> ModelBackend:
     """
     根据模型类型创建对应的推理后端
+    device 仅对 ONNX 后端生效（auto / cpu / cuda）
     """
     if model_type == "tflite":
         return TFLiteBackend()
+    elif model_type == "tensorrt":
+        return TensorRTBackend()
     else:
-        return ONNXBackend()
+        return ONNXBackend(device)
 
 
 class ObjectDetector:
     """
-    目标检测器 - 支持多种模型格式（ONNX、TFLite）
+    目标检测器 - 支持多种模型格式（ONNX、TFLite、TensorRT）
     通过统一的 ModelBackend 接口实现模型无关的检测逻辑
     """
 
-    def __init__(self, model_path: str):
+    def __init__(self, model_path: str, device: str = "auto"):
         self.model_path = model_path
         self.model_type = get_model_type(model_path)
+        self.device = device
         self.backend: ModelBackend | None = None
         self.input_shape: tuple = (1, 3, 640, 640)
         self._is_ready = False
         self.names: dict[int, str] = {i: name for i, name in enumerate(COCO_LABELS)}
+        # 多个 CameraTask 共享同一检测器，只有推理及读取后端复用输出缓冲区的后处理需串行，
+        # 预处理在各线程自己的缓冲区上进行，可与其他摄像头的推理重叠
+        self._lock = threading.Lock()
+        # letterbox 画布与输入张量按线程复用（各摄像头线程、流水线预处理线程各持一份），
+        # 仅在缩放尺寸变化时重新填充边框
+        self._local = threading.local()
+        # 每个摄像头最近一次的检测结果，无运动时可直接复用
+        self._last_detections: dict[str, list[dict[str, Any]]] = {}
+        # 加载后的预热推理次数
+        self.warmup_iterations = 8
+        # 模型相关常量，load_model 时解析一次，热路径上只做属性读取
+        self._target_size = 640
+        self._is_nhwc = False
+        self._is_ssd = False
+        self._input_dtype: Any = np.float32
+        self._input_quantization: tuple[Any, float, int] | None = None
 
     def load_model(self) -> bool:
         """加载模型并初始化推理后端"""
@@ -404,13 +902,14 @@ class ObjectDetector:
             start_time = time.time()
 
             # 创建对应类型的后端
-            self.backend = create_backend(self.model_type)
+            self.backend = create_backend(self.model_type, self.device)
 
             # 加载模型
             if not self.backend.load(self.model_path):
                 return False
 
             self.input_shape = self.backend.get_input_shape()
+            self._resolve_model_constants()
 
             # 预热模型
             self._warmup()
@@ -428,79 +927,170 @@ class ObjectDetector:
         if not self.backend:
             return
 
-        dummy_img = np.zeros((640, 640, 3), dtype=np.uint8)
-        dummy_input = self._preprocess(dummy_img)
-        self.backend.infer(dummy_input)
-        slog.info("模型预热完成")
+        # 按线上单帧路径（写入后端输入缓冲区）多跑几次，让内存池与算子选择稳定下来
+        size = self._target_size
+        dummy_img = np.zeros((size, size, 3), dtype=np.uint8)
+        input_buf = self.backend.get_input_buffer()
+        for _ in range(max(1, self.warmup_iterations)):
+            dummy_input = self._preprocess(dummy_img, out=input_buf)
+            if self._is_ssd:
+                self.backend.infer_ssd(dummy_input)
+            else:
+                self.backend.infer(dummy_input)
+        slog.info(f"模型预热完成 ({self.warmup_iterations} 次)")
 
     def is_ready(self) -> bool:
         return self._is_ready and self.backend is not None and self.backend.is_ready()
 
-    def _get_target_size(self) -> int:
-        """获取模型期望的输入尺寸"""
+    @staticmethod
+    def configure_threads(cameras: int = 1, intra_op_threads: int = 0) -> None:
+        """
+        按摄像头数配置 ONNX 推理线程数，需在首次 load_model 前调用
+        同一模型的会话在进程内共享，多个检测器不会各自创建线程池
+        onnxruntime、OpenCV 与 TFLite 的原生调用期间均已释放 GIL，
+        各摄像头线程的运动检测/预处理可与推理并行执行
+        """
+        ONNXBackend.configure_threads(cameras, intra_op_threads)
+
+    def _resolve_model_constants(self) -> None:
+        """根据已加载的后端解析输入布局、尺寸、数据类型与量化参数"""
+        is_tflite = isinstance(self.backend, TFLiteBackend)
+        self._is_nhwc = is_tflite and self.backend.is_nhwc()
+        self._is_ssd = is_tflite and self.backend.is_ssd_format()
         # NCHW: (1, 3, H, W) -> shape[2]
         # NHWC: (1, H, W, 3) -> shape[1]
-        if self._is_nhwc_format():
-            return int(self.input_shape[1])
-        return int(self.input_shape[2])
+        self._target_size = int(self.input_shape[1 if self._is_nhwc else 2])
+
+        if is_tflite:
+            self._input_dtype = self.backend.get_input_dtype()
+        elif isinstance(self.backend, ONNXBackend):
+            self._input_dtype = self.backend.input_dtype
+        else:
+            buf = self.backend.get_input_buffer() if self.backend else None
+            self._input_dtype = buf.dtype if buf is not None else np.float32
+
+        # 目前只有 TFLite 后端支持 uint8/int8 量化输入
+        self._input_quantization = None
+        if is_tflite and self._input_dtype in (np.uint8, np.int8):
+            scale, zero_point = self.backend.get_input_quantization()
+            self._input_quantization = (self._input_dtype, scale, zero_point)
+
+    def _get_target_size(self) -> int:
+        """获取模型期望的输入尺寸"""
+        return self._target_size
 
     def _is_nhwc_format(self) -> bool:
         """判断当前后端是否使用 NHWC 格式"""
-        if isinstance(self.backend, TFLiteBackend):
-            return self.backend.is_nhwc()
-        return False
+        return self._is_nhwc
 
     def _is_ssd_format(self) -> bool:
         """判断当前后端是否为 SSD 格式"""
-        if isinstance(self.backend, TFLiteBackend):
-            return self.backend.is_ssd_format()
-        return False
+        return self._is_ssd
+
+    def _letterbox_params(self, h: int, w: int) -> tuple[float, int, int, int, int]:
+        """
+        计算 letterbox 参数 (scale, new_w, new_h, left, top)
+        预处理与后处理共用同一组参数，坐标还原使用画布上的实际整数偏移
+        """
+        return letterbox_params(h, w, self._target_size)
 
-    def _preprocess(self, image: np.ndarray) -> np.ndarray:
+    def _preprocess(
+        self, image: np.ndarray, out: np.ndarray | None = None
+    ) -> np.ndarray:
         """
         预处理图像：调整大小、归一化、转换格式
         根据后端类型自动选择 NCHW 或 NHWC 格式，并处理量化输入
+        YOLO 分支传入 out 时直接写入该缓冲区（形状与模型输入一致）并返回它
         """
-        target_size = self._get_target_size()
+        target_size = self._target_size
         h, w = image.shape[:2]
 
         # SSD 模型使用直接缩放（不保持宽高比）
         # YOLO 模型使用 letterbox 缩放（保持宽高比）
-        if self._is_ssd_format():
+        if self._is_ssd:
             resized = cv2.resize(
                 image, (target_size, target_size), interpolation=cv2.INTER_LINEAR
             )
             rgb = resized[:, :, ::-1]  # BGR -> RGB
 
-            # 检查是否需要量化为 uint8
-            if isinstance(self.backend, TFLiteBackend):
-                input_dtype = self.backend.get_input_dtype()
-                if input_dtype == np.uint8:
-                    # 直接返回 uint8 格式
-                    return np.expand_dims(rgb.astype(np.uint8), axis=0)
+            # 检查是否需要量化为 uint8（SSD 仅来自 TFLite，输入类型在 load_model 时已解析）
+            if self._input_dtype == np.uint8:
+                # 直接返回 uint8 格式
+                return np.expand_dims(rgb.astype(np.uint8), axis=0)
 
             # float32 格式
             rgb = rgb.astype(np.float32) / 255.0
             return np.expand_dims(rgb, axis=0)
 
         # YOLO letterbox 预处理
-        scale = min(target_size / h, target_size / w)
-        new_h, new_w = int(h * scale), int(w * scale)
+        scale, new_w, new_h, left, top = self._letterbox_params(h, w)
+
+        local = self._local
+        canvas = getattr(local, "canvas", None)
+        if canvas is None or canvas.shape[0] != target_size:
+            canvas = np.full((target_size, target_size, 3), 114, dtype=np.uint8)
+            local.canvas = canvas
+            local.last_new_hw = (new_h, new_w)
+        elif (new_h, new_w) != local.last_new_hw:
+            # 缩放尺寸变化后旧图像可能残留在边框区域，需重新填充
+            canvas.fill(114)
+            local.last_new_hw = (new_h, new_w)
+
+        # 直接缩放到画布中心区域，省去中间图像的分配与拷贝
+        cv2.resize(
+            image,
+            (new_w, new_h),
+            dst=canvas[top : top + new_h, left : left + new_w],
+            interpolation=cv2.INTER_LINEAR,
+        )
 
-        resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        # 量化模型直接产出整型输入，跳过浮点转换
+        quantization = self._input_quantization
+        if quantization is not None:
+            tensor = self._quantize_rgb(canvas[:, :, ::-1], *quantization)
+            if not self._is_nhwc:
+                tensor = tensor.transpose(2, 0, 1)
+            if out is not None:
+                np.copyto(out[0], tensor)
+                return out
+            return np.expand_dims(np.ascontiguousarray(tensor), axis=0)
+
+        if out is not None:
+            # 直接归一化写入目标缓冲区，NCHW 缓冲区通过转置视图按 HWC 写入
+            dst = out[0] if self._is_nhwc else out[0].transpose(1, 2, 0)
+            np.divide(canvas[:, :, ::-1], 255.0, out=dst, dtype=np.float32)
+            return out
+
+        if self._is_nhwc:
+            rgb = np.divide(canvas[:, :, ::-1], 255.0, dtype=np.float32)
+            return np.expand_dims(rgb, axis=0)
 
-        canvas = np.full((target_size, target_size, 3), 114, dtype=np.uint8)
-        top = (target_size - new_h) // 2
-        left = (target_size - new_w) // 2
-        canvas[top : top + new_h, left : left + new_w] = resized
+        # blobFromImage 一次遍历完成 BGR->RGB、归一化与 HWC->NCHW，输出连续内存
+        return cv2.dnn.blobFromImage(canvas, 1.0 / 255.0, swapRB=True)
 
-        rgb = canvas[:, :, ::-1].astype(np.float32) / 255.0
+    def _get_input_dtype(self) -> Any:
+        """获取模型期望的输入数据类型"""
+        return self._input_dtype
 
-        if self._is_nhwc_format():
-            return np.expand_dims(rgb, axis=0)
-        else:
-            blob = rgb.transpose(2, 0, 1)
-            return np.expand_dims(blob, axis=0)
+    def _get_input_quantization(self) -> tuple[Any, float, int] | None:
+        """量化输入模型返回 (dtype, scale, zero_point)，浮点输入模型返回 None"""
+        return self._input_quantization
+
+    @staticmethod
+    def _quantize_rgb(
+        rgb: np.ndarray, dtype: Any, scale: float, zero_point: int
+    ) -> np.ndarray:
+        """
+        将 uint8 RGB 像素转换为量化输入：q = round(pixel / 255 / scale + zero_point)
+        YOLO 常见的 scale=1/255、zero_point=0 的 uint8 模型，像素值本身就是量化值
+        """
+        if dtype == np.uint8 and zero_point == 0 and abs(scale * 255.0 - 1.0) < 1e-3:
+            return rgb
+        if scale <= 0:
+            return rgb.astype(dtype)
+        info = np.iinfo(dtype)
+        q = np.rint(rgb.astype(np.float32) * (1.0 / (255.0 * scale)) + zero_point)
+        return np.clip(q, info.min, info.max).astype(dtype)
 
     def _postprocess(
         self,
@@ -513,112 +1103,171 @@ class ObjectDetector:
         后处理 YOLO 输出：解析检测框、应用 NMS、坐标转换
         YOLO11 输出格式: (1, 84, 8400) -> 84 = 4 (bbox) + 80 (classes)
         """
-        # 转置为 (8400, 84) 便于处理
-        predictions = outputs[0].T  # (8400, 84)
-
-        # 提取边界框和类别分数
-        boxes = predictions[:, :4]  # x_center, y_center, width, height
-        scores = predictions[:, 4:]  # 80 个类别的分数
-
-        # 获取每个检测框的最高分数和对应类别
-        class_ids = np.argmax(scores, axis=1)
-        confidences = np.max(scores, axis=1)
+        # 直接在 (84, 8400) 布局上沿类别轴归约：逐行比较整段连续内存，无需转置
+        predictions = outputs[0]
+        scores = predictions[4:]  # (80, 8400) 类别分数
+
+        # 先用每个候选框的最高分过滤，只对保留下来的少量列求 argmax 并取框
+        conf_max = scores.max(axis=0)
+        keep = np.flatnonzero(conf_max >= threshold)
+        if keep.size == 0:
+            return []
+        confidences = conf_max[keep]
+        class_ids = scores[:, keep].argmax(axis=0)
+        boxes = predictions[:4, keep].T  # (n, 4): x_center, y_center, width, height
 
-        # 过滤低置信度检测
-        mask = confidences >= threshold
-        boxes = boxes[mask]
-        confidences = confidences[mask]
-        class_ids = class_ids[mask]
+        # 缩放参数：与预处理共用 letterbox 的缩放比例与实际填充偏移
+        orig_h, orig_w = original_shape
+        scale, _, _, pad_w, pad_h = self._letterbox_params(orig_h, orig_w)
 
-        if len(boxes) == 0:
+        xyxy, boxes_for_nms = yolo_boxes_to_xyxy(
+            boxes, pad_w, pad_h, 1.0 / scale, orig_w, orig_h
+        )
+        # 整体落在 letterbox 填充区的框裁剪后面积为 0，先剔除，
+        # 两种 NMS 实现对零面积框的处理不同（OpenCV 中 0/0 的 IoU 会抑制后续零面积框）
+        valid = np.flatnonzero((boxes_for_nms[:, 2] > 0) & (boxes_for_nms[:, 3] > 0))
+        if valid.size == 0:
             return []
+        if valid.size < len(xyxy):
+            xyxy = xyxy[valid]
+            boxes_for_nms = boxes_for_nms[valid]
+            confidences = confidences[valid]
+            class_ids = class_ids[valid]
+
+        # 按类别做 NMS (非极大值抑制)，不同类别的框互不抑制
+        # NMSBoxesBatched 直接接收 numpy 数组，框格式为 (x, y, w, h)
+        if _HAS_NMS_BATCHED:
+            indices = cv2.dnn.NMSBoxesBatched(
+                boxes_for_nms,
+                confidences.astype(np.float32),
+                class_ids.astype(np.int32),
+                threshold,
+                0.45,  # NMS IoU 阈值
+            )
+        else:
+            indices = nms_numpy(xyxy, confidences, class_ids, 0.45)
 
-        # 转换坐标：center_x, center_y, w, h -> x1, y1, x2, y2
-        x_center, y_center, w, h = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
-        x1 = x_center - w / 2
-        y1 = y_center - h / 2
-        x2 = x_center + w / 2
-        y2 = y_center + h / 2
+        # 无保留框时返回空 tuple，统一转为一维整型索引数组
+        indices = np.asarray(indices, dtype=np.intp).reshape(-1)
+        if indices.size == 0:
+            return []
 
-        # 缩放坐标到原始图像尺寸
-        orig_h, orig_w = original_shape
-        target_size = self._get_target_size()
-        scale = min(target_size / orig_h, target_size / orig_w)
-        pad_h = (target_size - orig_h * scale) / 2
-        pad_w = (target_size - orig_w * scale) / 2
-
-        x1 = (x1 - pad_w) / scale
-        y1 = (y1 - pad_h) / scale
-        x2 = (x2 - pad_w) / scale
-        y2 = (y2 - pad_h) / scale
-
-        # 裁剪到图像边界
-        x1 = np.clip(x1, 0, orig_w)
-        y1 = np.clip(y1, 0, orig_h)
-        x2 = np.clip(x2, 0, orig_w)
-        y2 = np.clip(y2, 0, orig_h)
-
-        # NMS (非极大值抑制)
-        boxes_for_nms = np.stack([x1, y1, x2, y2], axis=1)
-        indices = cv2.dnn.NMSBoxes(
-            boxes_for_nms.tolist(),
-            confidences.tolist(),
-            threshold,
-            0.45,  # NMS IoU 阈值
+        return self._build_detections(
+            class_ids[indices],
+            confidences[indices],
+            xyxy[indices].astype(np.int32),
+            orig_w,
+            orig_h,
+            label_filter,
         )
 
-        detections = []
+    def _postprocess_ssd(
+        self,
+        boxes: np.ndarray,
+        classes: np.ndarray,
+        scores: np.ndarray,
+        num_detections: int,
+        original_shape: tuple[int, int],
+        threshold: float,
+        label_filter: list[str] | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        后处理 SSD 输出：模型内部已完成 NMS，只需按阈值过滤并转换坐标
+        boxes 为归一化坐标 [y_min, x_min, y_max, x_max]
+        """
+        if boxes.size == 0 or scores.size == 0 or classes.size == 0:
+            return []
 
-        # 处理 NMSBoxes 返回值的不同格式
-        # OpenCV 不同版本返回格式不同：可能是 list、tuple、ndarray
-        if indices is None or len(indices) == 0:
-            return detections
+        boxes = boxes.reshape(-1, 4)
+        classes = classes.reshape(-1)
+        scores = scores.reshape(-1)
 
-        # 将 indices 转换为一维列表
-        if isinstance(indices, np.ndarray):
-            indices = indices.flatten().tolist()
-        elif isinstance(indices, tuple):
-            indices = list(indices)
+        n = min(len(boxes), len(classes), len(scores))
+        if num_detections > 0:
+            n = min(n, num_detections)
 
-        for idx in indices:
-            # 确保 idx 是整数
-            idx = int(idx) if not isinstance(idx, int) else idx
+        scores = scores[:n]
+        mask = scores >= threshold
+        if not mask.any():
+            return []
 
-            cls_id = int(class_ids[idx])
-            label = self.names.get(cls_id, f"class_{cls_id}")
+        # 归一化坐标一次性缩放到原图尺寸并裁剪边界
+        orig_h, orig_w = original_shape
+        limits = np.array([orig_h, orig_w, orig_h, orig_w], dtype=np.float32)
+        pixel_boxes = np.clip(boxes[:n][mask] * limits, 0, limits).astype(np.int32)
+
+        # SSD 框为 [y_min, x_min, y_max, x_max]，调整为 xyxy 顺序
+        return self._build_detections(
+            classes[:n][mask].astype(np.int32),
+            scores[mask],
+            pixel_boxes[:, [1, 0, 3, 2]],
+            orig_w,
+            orig_h,
+            label_filter,
+        )
+
+    def _build_detections(
+        self,
+        class_ids: np.ndarray,
+        confidences: np.ndarray,
+        xyxy: np.ndarray,
+        orig_w: int,
+        orig_h: int,
+        label_filter: list[str] | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        构造检测结果列表，坐标为原图像素坐标
+        面积与归一化坐标按数组整体计算，转为 Python 列表后只在循环中组装字典
+        """
+        boxes, areas, norm_boxes = finalize_boxes(xyxy, orig_w, orig_h)
+        names = self.names
+        detections = []
+        for cls_id, conf, box, area, norm in zip(
+            class_ids.tolist(),
+            confidences.astype(np.float64).tolist(),
+            boxes,
+            areas,
+            norm_boxes,
+        ):
+            label = names.get(cls_id, f"class_{cls_id}")
 
             # 标签过滤
             if label_filter and label not in label_filter:
                 continue
 
-            x_min_val = int(x1[idx])
-            y_min_val = int(y1[idx])
-            x_max_val = int(x2[idx])
-            y_max_val = int(y2[idx])
-            area = (x_max_val - x_min_val) * (y_max_val - y_min_val)
-
             detections.append(
                 {
                     "label": label,
-                    "confidence": float(confidences[idx]),
+                    "confidence": conf,
                     "box": {
-                        "x_min": x_min_val,
-                        "y_min": y_min_val,
-                        "x_max": x_max_val,
-                        "y_max": y_max_val,
+                        "x_min": box[0],
+                        "y_min": box[1],
+                        "x_max": box[2],
+                        "y_max": box[3],
                     },
                     "area": area,
                     "norm_box": {
-                        "x": (x_min_val + x_max_val) / 2 / orig_w,
-                        "y": (y_min_val + y_max_val) / 2 / orig_h,
-                        "w": (x_max_val - x_min_val) / orig_w,
-                        "h": (y_max_val - y_min_val) / orig_h,
+                        "x": norm[0],
+                        "y": norm[1],
+                        "w": norm[2],
+                        "h": norm[3],
                     },
                 }
             )
-
         return detections
 
+    @staticmethod
+    def _norm_box(
+        x_min: int, y_min: int, x_max: int, y_max: int, img_w: int, img_h: int
+    ) -> dict[str, float]:
+        """计算归一化的中心点坐标与宽高"""
+        return {
+            "x": (x_min + x_max) / 2 / img_w,
+            "y": (y_min + y_max) / 2 / img_h,
+            "w": (x_max - x_min) / img_w,
+            "h": (y_max - y_min) / img_h,
+        }
+
     def detect(
         self,
         image: np.ndarray,
@@ -634,30 +1283,40 @@ class ObjectDetector:
         detections = []
 
         if regions and len(regions) > 0:
+            h, w = image.shape[:2]
+            crops = []
+            offsets = []
             for region in regions:
                 x_min, y_min, x_max, y_max = region
-                h, w = image.shape[:2]
                 x_min = max(0, x_min)
                 y_min = max(0, y_min)
                 x_max = min(w, x_max)
                 y_max = min(h, y_max)
 
                 if x_max <= x_min or y_max <= y_min:
+                    slog.debug(f"检测区域 {region} 裁剪到图像 {w}x{h} 后为空，跳过")
                     continue
 
+                # 裁剪结果是原图视图（零拷贝），cv2.resize 可直接处理非连续内存
                 cropped = image[y_min:y_max, x_min:x_max]
                 if cropped.size == 0:
                     continue
 
-                region_detections = self._detect_single(
-                    cropped, threshold, label_filter
-                )
+                crops.append(cropped)
+                offsets.append((x_min, y_min))
 
+            batch_detections = self._detect_batch(crops, threshold, label_filter)
+            for (x_min, y_min), region_detections in zip(offsets, batch_detections):
                 for det in region_detections:
-                    det["box"]["x_min"] += x_min
-                    det["box"]["y_min"] += y_min
-                    det["box"]["x_max"] += x_min
-                    det["box"]["y_max"] += y_min
+                    box = det["box"]
+                    box["x_min"] += x_min
+                    box["y_min"] += y_min
+                    box["x_max"] += x_min
+                    box["y_max"] += y_min
+                    # 归一化坐标需相对整幅图像而不是裁剪区域
+                    det["norm_box"] = self._norm_box(
+                        box["x_min"], box["y_min"], box["x_max"], box["y_max"], w, h
+                    )
                     detections.append(det)
         else:
             detections = self._detect_single(image, threshold, label_filter)
@@ -665,6 +1324,239 @@ class ObjectDetector:
         inference_time_ms = (time.time() - start_time) * 1000
         return detections, inference_time_ms
 
+    def detect_with_motion(
+        self,
+        image: np.ndarray,
+        camera_name: str,
+        motion_detector: "MotionDetector",
+        threshold: float = 0.5,
+        label_filter: list[str] | None = None,
+        roi_points: list[float] | None = None,
+        reuse_last: bool = False,
+    ) -> tuple[list[dict], float, bool]:
+        """
+        以运动检测作为门控执行目标检测，返回 (detections, inference_time_ms, has_motion)
+        无运动时跳过推理，reuse_last 为 True 时返回该摄像头上一次的检测结果，否则返回空
+        有运动时只对合并后的运动区域做（批量）检测
+        """
+        if not self.is_ready():
+            raise RuntimeError("模型未加载")
+
+        motion_boxes, has_motion = motion_detector.detect(
+            image, camera_name, roi_points
+        )
+        if not has_motion:
+            last = self._last_detections.get(camera_name, []) if reuse_last else []
+            return last, 0.0, False
+
+        h, w = image.shape[:2]
+        regions = self._merge_motion_regions(
+            motion_boxes, w, h, min(self._target_size, w, h)
+        )
+        detections, inference_time_ms = self.detect(
+            image, threshold, label_filter, regions=regions
+        )
+        self._last_detections[camera_name] = detections
+        return detections, inference_time_ms, True
+
+    def forget(self, camera_name: str) -> None:
+        """清除该摄像头缓存的检测结果，摄像头任务停止时调用"""
+        self._last_detections.pop(camera_name, None)
+
+    @staticmethod
+    def _merge_motion_regions(
+        motion_boxes: list[dict[str, Any]],
+        width: int,
+        height: int,
+        min_size: int,
+        max_regions: int = 4,
+        max_area_ratio: float = 0.5,
+    ) -> list[tuple[int, int, int, int]]:
+        """
+        将运动框合并为少量检测区域
+        每个框先以中心扩展到至少 min_size（避免小区域被放大过多），再合并相互重叠的框；
+        区域过多或总面积过大时直接退化为整幅图像，一次全图推理更划算
+        """
+        full_frame = [(0, 0, width, height)]
+        if not motion_boxes:
+            return full_frame
+
+        rects = []
+        for box in motion_boxes:
+            x_min, y_min = box["x_min"], box["y_min"]
+            x_max, y_max = box["x_max"], box["y_max"]
+            bw = max(x_max - x_min, min_size)
+            bh = max(y_max - y_min, min_size)
+            cx = (x_min + x_max) // 2
+            cy = (y_min + y_max) // 2
+            x_min = min(max(0, cx - bw // 2), max(0, width - bw))
+            y_min = min(max(0, cy - bh // 2), max(0, height - bh))
+            rects.append(
+                [x_min, y_min, min(width, x_min + bw), min(height, y_min + bh)]
+            )
+
+        # 反复合并重叠区域，直到区域两两不相交
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(rects)):
+                for j in range(i + 1, len(rects)):
+                    a, b = rects[i], rects[j]
+                    if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                        rects[i] = [
+                            min(a[0], b[0]),
+                            min(a[1], b[1]),
+                            max(a[2], b[2]),
+                            max(a[3], b[3]),
+                        ]
+                        del rects[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+
+        total_area = sum((r[2] - r[0]) * (r[3] - r[1]) for r in rects)
+        if len(rects) > max_regions or total_area > max_area_ratio * width * height:
+            return full_frame
+        return [(r[0], r[1], r[2], r[3]) for r in rects]
+
+    def detect_stream(
+        self,
+        images: Iterable[np.ndarray],
+        threshold: float = 0.5,
+        label_filter: list[str] | None = None,
+    ) -> Iterator[tuple[list[dict], float]]:
+        """
+        流水线检测：后台线程预处理下一帧的同时，当前线程对上一帧执行推理与后处理
+        预处理写入两块轮换使用的输入缓冲区（ping-pong），按输入顺序逐帧产出
+        (detections, inference_time_ms)，耗时从该帧开始预处理时计算
+        """
+        if not self.is_ready() or not self.backend:
+            raise RuntimeError("模型未加载")
+
+        # SSD 模型走专用推理接口，不做流水线
+        if self._is_ssd:
+            for image in images:
+                yield self.detect(image, threshold, label_filter)
+            return
+
+        target_size = self._target_size
+        if self._is_nhwc:
+            buf_shape = (1, target_size, target_size, 3)
+        else:
+            buf_shape = (1, 3, target_size, target_size)
+        dtype = self._input_dtype
+        buffers = [np.empty(buf_shape, dtype=dtype) for _ in range(2)]
+
+        free_slots: queue.Queue = queue.Queue()
+        for i in range(len(buffers)):
+            free_slots.put(i)
+        ready: queue.Queue = queue.Queue()
+        stop_event = threading.Event()
+
+        def _producer():
+            try:
+                for image in images:
+                    slot = free_slots.get()
+                    if stop_event.is_set():
+                        return
+                    start = time.time()
+                    self._preprocess(image, out=buffers[slot])
+                    ready.put((slot, image.shape[:2], start))
+            except Exception as e:
+                ready.put(e)
+            finally:
+                ready.put(None)
+
+        worker = threading.Thread(target=_producer, daemon=True)
+        worker.start()
+        try:
+            while True:
+                item = ready.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+
+                slot, original_shape, start = item
+                with self._lock:
+                    output = self.backend.infer(buffers[slot])
+                    detections = self._postprocess(
+                        output, original_shape, threshold, label_filter
+                    )
+                free_slots.put(slot)
+                yield detections, (time.time() - start) * 1000
+        finally:
+            # 调用方提前结束迭代时唤醒并结束预处理线程
+            stop_event.set()
+            free_slots.put(0)
+            worker.join(timeout=1)
+
+    def _get_max_batch(self) -> int:
+        """获取模型支持的 batch 大小，0 表示动态 batch（不限制）"""
+        batch = self.input_shape[0] if len(self.input_shape) > 0 else 1
+        if isinstance(batch, (int, np.integer)) and batch > 0:
+            return int(batch)
+        return 0
+
+    def _preprocess_batch(self, images: list[np.ndarray], batch: int) -> np.ndarray:
+        """
+        将多张图像分别 letterbox 后写入本线程预分配的 (batch, ...) 输入张量并返回
+        batch 大于图像数时多出的行保留旧数据，其输出不会被使用，无需清零
+        """
+        size = self._target_size
+        if self._is_nhwc:
+            sample_shape = (size, size, 3)
+        else:
+            sample_shape = (3, size, size)
+        local = self._local
+        blob = getattr(local, "batch_blob", None)
+        if (
+            blob is None
+            or blob.shape[0] < batch
+            or blob.shape[1:] != sample_shape
+            or blob.dtype != self._input_dtype
+        ):
+            blob = np.empty((batch,) + sample_shape, dtype=self._input_dtype)
+            local.batch_blob = blob
+        for i, img in enumerate(images):
+            self._preprocess(img, out=blob[i : i + 1])
+        return blob[:batch]
+
+    def _detect_batch(
+        self,
+        images: list[np.ndarray],
+        threshold: float,
+        label_filter: list[str] | None = None,
+    ) -> list[list[dict[str, Any]]]:
+        """
+        批量检测多张图像，一次推理处理多个区域，按输入顺序返回每张图像的检测结果
+        固定 batch 的模型按 batch 大小分组并补零，batch 为 1 时退化为逐张推理
+        """
+        if not self.backend or not self.backend.is_ready():
+            return [[] for _ in images]
+
+        max_batch = self._get_max_batch()
+        if len(images) <= 1 or max_batch == 1 or self._is_ssd:
+            return [self._detect_single(img, threshold, label_filter) for img in images]
+
+        step = max_batch or len(images)
+        results: list[list[dict[str, Any]]] = []
+        for start in range(0, len(images), step):
+            chunk = images[start : start + step]
+            # 固定 batch 模型按 batch 大小整块输入，动态 batch 只取实际图像数
+            input_tensor = self._preprocess_batch(chunk, max_batch or len(chunk))
+
+            with self._lock:
+                output = self.backend.infer(input_tensor)
+                for i, img in enumerate(chunk):
+                    results.append(
+                        self._postprocess(
+                            output[i : i + 1], img.shape[:2], threshold, label_filter
+                        )
+                    )
+        return results
+
     def _detect_single(
         self, image: np.ndarray, threshold: float, label_filter: list[str] | None = None
     ) -> list[dict[str, Any]]:
@@ -672,27 +1564,117 @@ class ObjectDetector:
         if not self.backend or not self.backend.is_ready():
             return []
 
-        # 预处理
-        input_tensor = self._preprocess(image)
-
-        # 推理
-        output = self.backend.infer(input_tensor)
+        # 预处理写入本线程的输入张量（与后端持久输入缓冲区同形状），推理时再拷入后端
+        input_tensor = self._preprocess(image, out=self._thread_input_buffer())
 
-        # 后处理
         original_shape = image.shape[:2]
-        return self._postprocess(output, original_shape, threshold, label_filter)
+
+        # SSD 模型自带后处理，直接解析输出，无需 argmax 与 NMS
+        if self._is_ssd:
+            with self._lock:
+                boxes, classes, scores, num = self.backend.infer_ssd(input_tensor)
+            return self._postprocess_ssd(
+                boxes, classes, scores, num, original_shape, threshold, label_filter
+            )
+
+        # 推理；后端可能返回复用的输出缓冲区，后处理完成前不能释放锁
+        with self._lock:
+            output = self.backend.infer(input_tensor)
+            return self._postprocess(output, original_shape, threshold, label_filter)
+
+    def _thread_input_buffer(self) -> np.ndarray | None:
+        """
+        返回本线程的输入张量，形状与类型同后端持久输入缓冲区，按线程复用
+        后端没有持久输入缓冲区时返回 None，由预处理自行分配
+        """
+        backend_buf = self.backend.get_input_buffer() if self.backend else None
+        if backend_buf is None:
+            return None
+        local = self._local
+        buf = getattr(local, "input_buf", None)
+        if (
+            buf is None
+            or buf.shape != backend_buf.shape
+            or buf.dtype != backend_buf.dtype
+        ):
+            buf = np.empty_like(backend_buf)
+            local.input_buf = buf
+        return buf
 
 
 class MotionDetector:
     """
     运动检测器 - 基于背景差分法
     用于在目标检测前预筛选有运动的帧，减少不必要的 AI 推理
+    use_opencl 为 True 且存在 OpenCL 设备（如核显）时，像素级运算通过 cv2.UMat 卸载到 GPU
     """
 
-    def __init__(self):
-        self.backgrounds: dict[str, np.ndarray] = {}
+    def __init__(self, use_opencl: bool = False):
+        self.use_opencl = use_opencl and cv2.ocl.haveOpenCL()
+        if self.use_opencl:
+            cv2.ocl.setUseOpenCL(True)
+        elif use_opencl:
+            slog.warning("未检测到可用的 OpenCL 设备，运动检测使用 CPU")
+        self.backgrounds: dict[str, Any] = {}
         self.motion_threshold = 25
         self.min_contour_area = 500
+        # 降采样倍数：运动检测只用于门控 AI 推理，在 1/downscale 分辨率上处理即可
+        # 1/4 分辨率（1080p -> 480x270）仍足以定位运动区域
+        self.downscale = 4
+        # 每个摄像头复用的中间结果缓冲区，避免每帧重新分配整帧内存
+        self._buffers: dict[str, dict[str, Any]] = {}
+        # 每个摄像头的 ROI 掩码缓存：camera -> ((w, h, roi_points), mask, 参与运算的掩码)
+        self._roi_masks: dict[str, tuple[tuple, np.ndarray, Any]] = {}
+        self._dilate_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+
+    def _alloc(self, shape: tuple[int, int]) -> Any:
+        """分配单通道 uint8 工作缓冲区，启用 OpenCL 时分配在设备端"""
+        if self.use_opencl:
+            return cv2.UMat(shape[0], shape[1], cv2.CV_8UC1)
+        return np.empty(shape, dtype=np.uint8)
+
+    def _get_buffers(self, camera_name: str, h: int, w: int) -> dict[str, Any]:
+        """获取摄像头对应的工作缓冲区，分辨率变化时重新分配并重置背景"""
+        bufs = self._buffers.get(camera_name)
+        if bufs is None or bufs["size"] != (h, w):
+            small_shape = (max(1, h // self.downscale), max(1, w // self.downscale))
+            bufs = {"size": (h, w), "small_shape": small_shape}
+            bufs["gray"] = self._alloc((h, w))
+            # INTER_AREA 只有整 2 倍缩小走快速路径，更大的偶数倍数拆成多次减半
+            factor, shape, levels = self.downscale, (h, w), []
+            while factor > 2 and factor % 2 == 0:
+                shape = (max(1, shape[0] // 2), max(1, shape[1] // 2))
+                levels.append((self._alloc(shape), (shape[1], shape[0])))
+                factor //= 2
+            bufs["levels"] = levels
+            for name in ("small", "blur", "background", "delta", "thresh", "dilated"):
+                bufs[name] = self._alloc(small_shape)
+            self._buffers[camera_name] = bufs
+            self.backgrounds.pop(camera_name, None)
+        return bufs
+
+    def _get_roi_mask(
+        self, camera_name: str, h: int, w: int, roi_points: list[float]
+    ) -> Any:
+        """获取 ROI 多边形掩码，仅在尺寸或 ROI 变化时重新绘制"""
+        key = (w, h, tuple(roi_points))
+        cached = self._roi_masks.get(camera_name)
+        if cached is not None and cached[0] == key:
+            return cached[2]
+
+        # 归一化坐标 [x0, y0, x1, y1, ...] 一次性换算为像素坐标
+        pts = np.asarray(roi_points, dtype=np.float32).reshape(-1, 2) * (w, h)
+        if cached is not None and cached[1].shape == (h, w):
+            # 尺寸不变仅 ROI 变化时复用已有掩码内存
+            mask = cached[1]
+            mask.fill(0)
+        else:
+            mask = np.zeros((h, w), dtype=np.uint8)
+        cv2.fillPoly(mask, [pts.astype(np.int32)], (255,))  # type: ignore
+        # 启用 OpenCL 时掩码只在变化时上传一次
+        device_mask = cv2.UMat(mask) if self.use_opencl else mask
+        self._roi_masks[camera_name] = (key, mask, device_mask)
+        return device_mask
 
     def detect(
         self,
@@ -701,51 +1683,78 @@ class MotionDetector:
         roi_points: list[float] | None = None,
     ) -> tuple[list[dict[str, Any]], bool]:
         h, w = image.shape[:2]
-        if len(image.shape) == 3:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        bufs = self._get_buffers(camera_name, h, w)
+        # 启用 OpenCL 时上传一次原图，后续运算都在设备端缓冲区之间进行
+        src = cv2.UMat(image) if self.use_opencl else image
+        if image.ndim == 3:
+            gray = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY, dst=bufs["gray"])
         else:
-            gray = image.copy()
+            gray = src
+
+        # 降采样后再做后续处理，像素数减少为 1/downscale^2
+        for level, size in bufs["levels"]:
+            gray = cv2.resize(gray, size, dst=level, interpolation=cv2.INTER_AREA)
+        small_h, small_w = bufs["small_shape"]
+        gray = cv2.resize(
+            gray, (small_w, small_h), dst=bufs["small"], interpolation=cv2.INTER_AREA
+        )
+        h, w = small_h, small_w
 
-        # 高斯模糊平滑噪点
-        gray = cv2.GaussianBlur(gray, (21, 21), 0)
+        # 均值滤波平滑噪点，盒式滤波每像素开销与核大小无关，用于运动检测效果与高斯模糊相当
+        # 降采样后核大小按倍数缩小（1/4 分辨率下为 5x5）
+        ksize = max(3, (21 // self.downscale) | 1)
+        gray = cv2.blur(gray, (ksize, ksize), dst=bufs["blur"])
 
+        # 背景直接以 uint8 维护滑动平均，全程走整型 SIMD 路径，无需浮点背景与回转换
+        background = bufs["background"]
         if camera_name not in self.backgrounds:
-            self.backgrounds[camera_name] = gray.astype(np.float32)
+            cv2.copyTo(gray, None, background)
+            self.backgrounds[camera_name] = background
             return [], False
 
-        cv2.accumulateWeighted(gray, self.backgrounds[camera_name], 0.1)
+        cv2.addWeighted(gray, 0.1, background, 0.9, 0, dst=background)
 
-        frame_delta = cv2.absdiff(
-            gray, cv2.convertScaleAbs(self.backgrounds[camera_name])
-        )
+        frame_delta = cv2.absdiff(gray, background, dst=bufs["delta"])
         thresh = cv2.threshold(
-            frame_delta, self.motion_threshold, 255, cv2.THRESH_BINARY
+            frame_delta,
+            self.motion_threshold,
+            255,
+            cv2.THRESH_BINARY,
+            dst=bufs["thresh"],
         )[1]
 
         # ROI 区域掩码
         if roi_points and len(roi_points) > 0:
-            mask = np.zeros((h, w), dtype=np.uint8)
-            pts = []
-            for i in range(0, len(roi_points), 2):
-                pts.append((int(roi_points[i] * w), int(roi_points[i + 1] * h)))
-            pts_np = np.array([pts], dtype=np.int32)
-            cv2.fillPoly(mask, [pts_np], (255,))  # type: ignore
-            thresh = cv2.bitwise_and(thresh, thresh, mask=mask)
+            mask = self._get_roi_mask(camera_name, h, w, roi_points)
+            thresh = cv2.bitwise_and(thresh, mask, dst=thresh)
 
-        kernel = np.ones((3, 3), np.uint8)
-        thresh = cv2.dilate(thresh, kernel, iterations=2)
+        thresh = cv2.dilate(
+            thresh, self._dilate_kernel, dst=bufs["dilated"], iterations=2
+        )
 
+        # findContours 没有 UMat 实现，需下载到主机内存
+        if self.use_opencl:
+            thresh = thresh.get()
         contours, _ = cv2.findContours(
             thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
         )
 
+        # 面积阈值与坐标都需按降采样倍数换算回原图
+        scale = self.downscale
+        min_area = self.min_contour_area / (scale * scale)
+        full_h, full_w = image.shape[:2]
         motion_boxes = []
         for contour in contours:
-            if cv2.contourArea(contour) < self.min_contour_area:
+            if cv2.contourArea(contour) < min_area:
                 continue
             x, y, cw, ch = cv2.boundingRect(contour)
             motion_boxes.append(
-                {"y_min": y, "x_min": x, "y_max": y + ch, "x_max": x + cw}
+                {
+                    "y_min": y * scale,
+                    "x_min": x * scale,
+                    "y_max": min(full_h, (y + ch) * scale),
+                    "x_max": min(full_w, (x + cw) * scale),
+                }
             )
 
         has_motion = len(motion_boxes) > 0
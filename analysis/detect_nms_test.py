@@ -0,0 +1,70 @@
+"""
+NMS 实现一致性测试
+使用方法: python -m pytest detect_nms_test.py
+
+对同一批 letterbox 输入比较 NumPy 回退实现与 cv2.dnn.NMSBoxesBatched 的保留结果
+"""
+
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from detect import nms_numpy, yolo_boxes_to_xyxy
+
+requires_batched = pytest.mark.skipif(
+    not hasattr(cv2.dnn, "NMSBoxesBatched"), reason="OpenCV 缺少 NMSBoxesBatched"
+)
+
+
+def _letterboxed_candidates(seed: int, n: int = 400):
+    """模拟 1920x1080 画面 letterbox 到 640x640 后的候选框，部分框整体落在上下填充区"""
+    rng = np.random.default_rng(seed)
+    orig_w, orig_h = 1920, 1080
+    scale = 640 / orig_w
+    pad_w, pad_h = 0.0, (640 - orig_h * scale) / 2
+    boxes = np.empty((n, 4), dtype=np.float32)
+    boxes[:, 0] = rng.uniform(0, 640, n)
+    boxes[:, 1] = rng.uniform(0, 640, n)
+    boxes[:, 2:4] = rng.uniform(2, 80, (n, 2))
+    # 约四分之一的框放进填充区，裁剪后面积为 0
+    in_pad = rng.random(n) < 0.25
+    boxes[in_pad, 1] = rng.uniform(0, pad_h - 45, in_pad.sum())
+    boxes[in_pad, 3] = rng.uniform(2, 40, in_pad.sum())
+    scores = rng.uniform(0.3, 1.0, n).astype(np.float32)
+    class_ids = rng.integers(0, 3, n).astype(np.int32)
+    xyxy, xywh = yolo_boxes_to_xyxy(boxes, pad_w, pad_h, 1.0 / scale, orig_w, orig_h)
+    return xyxy, xywh, scores, class_ids
+
+
+@requires_batched
+@pytest.mark.parametrize("seed", range(5))
+def test_nms_numpy_matches_opencv(seed):
+    xyxy, xywh, scores, class_ids = _letterboxed_candidates(seed)
+    areas = xywh[:, 2] * xywh[:, 3]
+    assert (areas <= 0).any()
+
+    # 与 _postprocess 一致：零面积框先剔除，再交给 OpenCV
+    valid = np.flatnonzero((xywh[:, 2] > 0) & (xywh[:, 3] > 0))
+    cv_keep = cv2.dnn.NMSBoxesBatched(
+        xywh[valid], scores[valid], class_ids[valid], 0.25, 0.45
+    )
+    expected = valid[np.asarray(cv_keep, dtype=np.intp).reshape(-1)]
+
+    keep = nms_numpy(xyxy, scores, class_ids, 0.45)
+    assert sorted(keep.tolist()) == sorted(expected.tolist())
+
+
+def test_nms_numpy_drops_zero_area_boxes():
+    boxes = np.array(
+        [[0, 0, 10, 10], [20, 0, 20, 10], [30, 5, 40, 5], [50, 50, 60, 60]],
+        dtype=np.float32,
+    )
+    scores = np.array([0.9, 0.8, 0.7, 0.6], dtype=np.float32)
+    class_ids = np.zeros(4, dtype=np.int32)
+    assert nms_numpy(boxes, scores, class_ids, 0.45).tolist() == [0, 3]
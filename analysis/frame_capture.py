@@ -1,16 +1,26 @@
 from collections import deque
+import contextlib
+import hashlib
+import json
 import logging
 import os
-import queue
 import subprocess
 import threading
-import time
 from typing import Deque, Optional
+import cv2
 import numpy as np
 
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，仅做进程内互斥
+    fcntl = None
+
 
 slog = logging.getLogger("Capture")
 
+# 多路摄像头共用同一个流信息缓存文件，读改写需串行
+_stream_info_cache_lock = threading.Lock()
+
 
 class LogPipe(threading.Thread):
     def __init__(self, log_name: str):
@@ -62,15 +72,22 @@ class FrameCapture:
     def __init__(
         self,
         rtsp_url: str,
-        output_queue: queue.Queue,
         detect_fps: int = 5,
         retry_limit: int = 10,
+        pix_fmt: str = "yuv420p",
     ):
         self.rtsp_url = rtsp_url
-        self.output_queue = output_queue
+        # 单槽最新帧：deque(maxlen=1) 自动丢弃未取走的旧帧，生产方不会阻塞；
+        # Condition 负责唤醒等待中的消费方，消费方通过 get_frame 取帧
+        self._latest_frame: Deque[np.ndarray] = deque(maxlen=1)
+        self._frame_cond = threading.Condition()
         self.target_fps = detect_fps
         self.retry_limit = retry_limit
+        # ffmpeg 输出像素格式：yuv420p 每像素 1.5 字节，管道数据量为 bgr24 的一半
+        self.pix_fmt = pix_fmt
         self._stop_event = threading.Event()
+        # 流信息已知（或探测彻底失败）时置位，供 wait_stream_info 等待
+        self._stream_ready = threading.Event()
         self._thread: Optional[threading.Thread] = None
         self._proccess: Optional[subprocess.Popen] = None
 
@@ -78,12 +95,22 @@ class FrameCapture:
         self.width = 0
         self.height = 0
         self.fps = 0.0
+        # 流信息缓存：已知摄像头重连时跳过 ffprobe 探测
+        self._cache_path = "/tmp/framecap_dims.json"
+        self._cache_key = hashlib.sha1(rtsp_url.encode("utf-8")).hexdigest()
+        self._info_from_cache = False
+        # 后台复核发现缓存分辨率过期时置位，读取循环据此按新尺寸重启
+        self._dims_changed = False
 
         # 错误状态，供外部查询
         self.error_count = 0
         self.last_error = ""
         self.is_failed = False
 
+        # 可复用的帧缓冲区：只回收未被消费就被新帧替换掉的旧帧，消费方拿到的帧不会被覆盖
+        self._free_frames: list[np.ndarray] = []
+        self.max_free_frames = 2
+
     def start(self):
         if self._thread is not None and self._thread.is_alive():
             return
@@ -93,8 +120,10 @@ class FrameCapture:
         slog.info(f"FrameCapture started for {self.rtsp_url}")
 
     def stop(self):
-        # 设置停止事件
+        # 设置停止事件，并唤醒等待帧的消费方
         self._stop_event.set()
+        with self._frame_cond:
+            self._frame_cond.notify_all()
         # 终止进程
         self._terminate_process()
         # 等待线程结束
@@ -102,7 +131,67 @@ class FrameCapture:
             self._thread.join(timeout=2)
         slog.info(f"FrameCapture stopped for {self.rtsp_url}")
 
-    def _get_stream_info(self) -> bool:
+    def _load_stream_cache(self) -> dict:
+        try:
+            with open(self._cache_path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+            return cache if isinstance(cache, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    @contextlib.contextmanager
+    def _locked_stream_cache(self):
+        """
+        串行化缓存文件的读改写：进程内用线程锁，
+        --camera-processes 的各工作进程之间再对锁文件加 flock，避免互相覆盖条目
+        """
+        with _stream_info_cache_lock:
+            if fcntl is None:
+                yield
+                return
+            try:
+                lock_file = open(f"{self._cache_path}.lock", "a")
+            except OSError as e:
+                slog.warning(f"打开流信息缓存锁文件失败: {e}")
+                yield
+                return
+            with lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield
+
+    def _update_stream_cache(self, info: Optional[list]) -> None:
+        """写入或删除（info 为 None）当前 URL 的缓存条目"""
+        with self._locked_stream_cache():
+            cache = self._load_stream_cache()
+            if info is None:
+                if cache.pop(self._cache_key, None) is None:
+                    return
+            else:
+                cache[self._cache_key] = info
+            tmp_path = f"{self._cache_path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(cache, f)
+                os.replace(tmp_path, self._cache_path)
+            except OSError as e:
+                slog.warning(f"写入流信息缓存失败: {e}")
+
+    def _get_cached_stream_info(self) -> bool:
+        with _stream_info_cache_lock:
+            info = self._load_stream_cache().get(self._cache_key)
+        try:
+            width, height, fps = int(info[0]), int(info[1]), float(info[2])
+        except (TypeError, ValueError, IndexError):
+            return False
+        if width <= 0 or height <= 0:
+            return False
+        self.width, self.height, self.fps = width, height, fps
+        self._info_from_cache = True
+        slog.info(f"使用缓存的流信息: {width}x{height} @ {fps:.2f}fps")
+        return True
+
+    def _probe_stream_info(self) -> Optional[tuple[int, int, float]]:
+        """用 ffprobe 探测流的宽、高与帧率，失败时返回 None"""
         slog.debug(f"正在探测流信息... {self.rtsp_url}")
         ffprobe_cmd = [
             "ffprobe",
@@ -125,21 +214,54 @@ class FrameCapture:
             )
             parts = output.split(",")
             if len(parts) >= 2:
-                self.width = int(parts[0])
-                self.height = int(parts[1])
+                width = int(parts[0])
+                height = int(parts[1])
                 if len(parts) >= 3 and "/" in parts[2]:
                     num, den = parts[2].split("/")
-                    self.fps = float(num) / float(den)
+                    fps = float(num) / float(den)
                 else:
-                    self.fps = 25.0
-                slog.info(
-                    f"ffprobe 探测成功: {self.width}x{self.height} @ {self.fps:.2f}fps"
-                )
-                return True
+                    fps = 25.0
+                slog.info(f"ffprobe 探测成功: {width}x{height} @ {fps:.2f}fps")
+                return width, height, fps
         except Exception as e:
             slog.error(f"探测流信息失败: {e}")
 
-        return False
+        return None
+
+    def _get_stream_info(self) -> bool:
+        if self._get_cached_stream_info():
+            return True
+        info = self._probe_stream_info()
+        if info is None:
+            return False
+        self.width, self.height, self.fps = info
+        self._info_from_cache = False
+        self._update_stream_cache(list(info))
+        return True
+
+    def _verify_cached_stream_info(
+        self, proc: subprocess.Popen, cached: tuple[int, int]
+    ) -> None:
+        """
+        使用缓存的流信息启动后，在后台用 ffprobe 复核分辨率
+        readinto 只在 EOF 时才返回不足一帧，分辨率变化后按旧尺寸切帧不会报错，
+        因此尺寸不符时更新缓存并结束当前 ffmpeg 进程，读取循环按新尺寸重启
+        """
+        info = self._probe_stream_info()
+        if info is None or self._stop_event.is_set():
+            return
+        self._info_from_cache = False
+        self._update_stream_cache(list(info))
+        if info[:2] == cached:
+            return
+        slog.warning(
+            f"缓存的分辨率 {cached[0]}x{cached[1]} 已过期，"
+            f"实际为 {info[0]}x{info[1]}，按新尺寸重启 ffmpeg"
+        )
+        self.width, self.height, self.fps = info
+        self._dims_changed = True
+        if proc.poll() is None:
+            proc.terminate()
 
     def _capture_loop(self):
 
@@ -154,14 +276,23 @@ class FrameCapture:
                             f"探测流信息失败，已重试 {self.error_count} 次"
                         )
                         slog.error(self.last_error)
+                        self._stream_ready.set()
                         return
-                    time.sleep(3)
+                    self._stop_event.wait(3)
                     continue
             # 成功获取流信息后重置错误计数
             self.error_count = 0
+            self._stream_ready.set()
             if log_pipe:
                 log_pipe.close()
             log_pipe = LogPipe(f"ffmpeg.{self.rtsp_url}")
+            # I420 要求宽高为偶数，否则回退到 bgr24
+            yuv = (
+                self.pix_fmt == "yuv420p"
+                and self.width % 2 == 0
+                and self.height % 2 == 0
+            )
+            pix_fmt = "yuv420p" if yuv else "bgr24"
             ffmpeg_cmd = [
                 "ffmpeg",
                 "-hide_banner",
@@ -174,7 +305,11 @@ class FrameCapture:
                 "-f",
                 "rawvideo",
                 "-pix_fmt",
-                "bgr24",  # 直接输出 OpenCV 友好的 BGR 格式
+                pix_fmt,
+                # 输出尺寸固定为帧缓冲区尺寸：缓存的分辨率过期时帧仍能按正确的偏移切分，
+                # 直到后台复核发现差异后按新尺寸重启
+                "-s",
+                f"{self.width}x{self.height}",
                 "-r",
                 str(self.target_fps),  # 降低帧率
                 "pipe:1",
@@ -192,10 +327,24 @@ class FrameCapture:
                 slog.error(f"启动 ffmpeg 进程失败: {e}")
                 if log_pipe:
                     log_pipe.dump()
-                time.sleep(3)
+                self._stop_event.wait(3)
                 continue
-            frame_size = self.width * self.height * 3
+            if yuv:
+                # I420 平面布局：Y (h, w) 之后紧跟 U、V 各 (h/2, w/2)
+                frame_shape = (self.height * 3 // 2, self.width)
+            else:
+                frame_shape = (self.height, self.width, 3)
+            frame_size = int(np.prod(frame_shape))
+            # 重新探测后分辨率可能变化，旧缓冲区不再可用
+            self._free_frames.clear()
             slog.info(f"开始读取帧 (size={frame_size})...")
+            if self._info_from_cache:
+                threading.Thread(
+                    target=self._verify_cached_stream_info,
+                    args=(self._proccess, (self.width, self.height)),
+                    daemon=True,
+                ).start()
+            first_frame = True
 
             while not self._stop_event.is_set():
                 try:
@@ -206,25 +355,28 @@ class FrameCapture:
                     if self._proccess.stdout is None:
                         slog.error("FFmpeg 进程 stdout 为空")
                         break
-                    raw_bytes = self._proccess.stdout.read(frame_size)
+                    # 直接读入帧缓冲区，不再为每帧创建 bytes 对象
+                    if self._free_frames:
+                        image = self._free_frames.pop()
+                    else:
+                        image = np.empty(frame_shape, dtype=np.uint8)
+                    n = self._proccess.stdout.readinto(image)
 
-                    if len(raw_bytes) != frame_size:
+                    if n != frame_size:
                         slog.warning("读取到不完整的帧 (流中断?)")
                         log_pipe.dump()  # 可能有网络错误
+                        if (
+                            first_frame
+                            and self._info_from_cache
+                            and not self._stop_event.is_set()
+                        ):
+                            # 缓存的分辨率可能已过期，清除后重新探测
+                            slog.warning("首帧长度与缓存的流信息不符，重新探测")
+                            self._invalidate_stream_info()
                         break
-                    image = np.frombuffer(raw_bytes, dtype=np.uint8).reshape(
-                        self.height, self.width, 3
-                    )
-
-                    try:
-                        while not self.output_queue.empty():
-                            try:
-                                self.output_queue.get_nowait()
-                            except queue.Empty:
-                                break
-                        self.output_queue.put_nowait(image)
-                    except Exception as e:
-                        pass
+
+                    first_frame = False
+                    self._publish_frame(image, frame_shape)
 
                 except Exception as e:
                     slog.error(f"读取帧失败: {e}")
@@ -239,6 +391,11 @@ class FrameCapture:
             if self._stop_event.is_set():
                 break
 
+            if self._dims_changed:
+                # 分辨率变化导致的重启不计入错误
+                self._dims_changed = False
+                continue
+
             # ffmpeg 进程异常退出也计入错误计数
             self.error_count += 1
             if self.error_count >= self.retry_limit:
@@ -246,7 +403,45 @@ class FrameCapture:
                 self.last_error = f"帧捕获失败，已重试 {self.error_count} 次"
                 slog.error(self.last_error)
                 return
-            time.sleep(2)
+            self._stop_event.wait(2)
+
+    def _publish_frame(self, image: np.ndarray, frame_shape: tuple) -> None:
+        """发布最新帧，先取出尚未被消费的旧帧回收复用"""
+        with self._frame_cond:
+            if self._latest_frame:
+                self._recycle_frame(self._latest_frame.popleft(), frame_shape)
+            self._latest_frame.append(image)
+            self._frame_cond.notify()
+
+    def _invalidate_stream_info(self) -> None:
+        self._update_stream_cache(None)
+        self._info_from_cache = False
+        self._stream_ready.clear()
+        self.width = 0
+        self.height = 0
+        self.fps = 0.0
+
+    def get_frame(self, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """取走最新一帧，timeout 内没有新帧或已停止时返回 None"""
+        with self._frame_cond:
+            self._frame_cond.wait_for(
+                lambda: self._latest_frame or self._stop_event.is_set(), timeout
+            )
+            if not self._latest_frame:
+                return None
+            return self._latest_frame.popleft()
+
+    @staticmethod
+    def to_bgr(frame: np.ndarray) -> np.ndarray:
+        """将输出队列中的帧转换为 BGR 图像，yuv420p 帧为二维 I420 平面数组"""
+        if frame.ndim == 2:
+            return cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_I420)
+        return frame
+
+    def _recycle_frame(self, frame: np.ndarray, frame_shape: tuple) -> None:
+        """回收未被消费的旧帧，供后续读取复用"""
+        if len(self._free_frames) < self.max_free_frames and frame.shape == frame_shape:
+            self._free_frames.append(frame)
 
     def _terminate_process(self):
         if self._proccess:
@@ -275,3 +470,8 @@ class FrameCapture:
     def get_stream_info(self):
         """返回流的基本信息"""
         return self.width, self.height, self.fps
+
+    def wait_stream_info(self, timeout: Optional[float] = None):
+        """等待流信息就绪后返回，超时或探测失败时宽高为 0"""
+        self._stream_ready.wait(timeout)
+        return self.get_stream_info()
@@ -0,0 +1,145 @@
+"""
+FrameCapture 流信息缓存测试
+使用方法: python -m pytest frame_capture_test.py
+
+用假的 ffprobe / ffmpeg 脚本替代真实命令：ffprobe 输出 FAKE_STREAM_DIMS 指定的分辨率，
+ffmpeg 按 -s 参数输出 yuv420p 帧，并把每次启动的参数追加到 FAKE_FFMPEG_LOG
+"""
+
+import json
+import multiprocessing
+import os
+import stat
+import sys
+import time
+
+import pytest
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from frame_capture import FrameCapture
+
+FAKE_FFPROBE = """#!{python}
+import os
+w, h = os.environ["FAKE_STREAM_DIMS"].split("x")
+print(f"{{w}},{{h}},25/1")
+"""
+
+FAKE_FFMPEG = """#!{python}
+import os, sys, time
+args = sys.argv[1:]
+with open(os.environ["FAKE_FFMPEG_LOG"], "a") as f:
+    f.write(" ".join(args) + "\\n")
+w, h = map(int, args[args.index("-s") + 1].split("x"))
+frame = bytes(w * h * 3 // 2)
+try:
+    while True:
+        sys.stdout.buffer.write(frame)
+        sys.stdout.buffer.flush()
+        time.sleep(0.02)
+except (BrokenPipeError, KeyboardInterrupt):
+    pass
+"""
+
+
+@pytest.fixture
+def fake_tools(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for name, source in (("ffprobe", FAKE_FFPROBE), ("ffmpeg", FAKE_FFMPEG)):
+        path = bin_dir / name
+        path.write_text(source.format(python=sys.executable))
+        path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    log_path = tmp_path / "ffmpeg.log"
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_FFMPEG_LOG", str(log_path))
+    return tmp_path, log_path
+
+
+def _make_capture(tmp_path, cached_dims=None) -> FrameCapture:
+    capture = FrameCapture("rtsp://camera/stream", detect_fps=5, retry_limit=3)
+    capture._cache_path = str(tmp_path / "dims.json")
+    if cached_dims is not None:
+        capture._update_stream_cache([cached_dims[0], cached_dims[1], 25.0])
+    return capture
+
+
+def _wait_frame_shape(capture: FrameCapture, shape: tuple, timeout: float = 10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        frame = capture.get_frame(timeout=0.5)
+        if frame is not None and frame.shape == shape:
+            return frame
+    pytest.fail(f"未在 {timeout}s 内读到形状为 {shape} 的帧")
+
+
+def test_stale_cached_dims_are_reprobed(fake_tools, monkeypatch):
+    tmp_path, log_path = fake_tools
+    # 缓存记录的是旧分辨率，摄像头实际已改为 32x24
+    monkeypatch.setenv("FAKE_STREAM_DIMS", "32x24")
+    capture = _make_capture(tmp_path, cached_dims=(64, 48))
+    capture.start()
+    try:
+        # 先按缓存尺寸出帧，后台复核后按实际尺寸重启
+        _wait_frame_shape(capture, (24 * 3 // 2, 32))
+        assert capture.get_stream_info()[:2] == (32, 24)
+        assert not capture.is_failed
+        assert capture.error_count == 0
+    finally:
+        capture.stop()
+
+    with open(capture._cache_path, encoding="utf-8") as f:
+        assert json.load(f)[capture._cache_key][:2] == [32, 24]
+    launches = log_path.read_text().splitlines()
+    assert "-s 64x48" in launches[0]
+    assert "-s 32x24" in launches[-1]
+
+
+def test_valid_cached_dims_keep_running(fake_tools, monkeypatch):
+    tmp_path, log_path = fake_tools
+    monkeypatch.setenv("FAKE_STREAM_DIMS", "32x24")
+    capture = _make_capture(tmp_path, cached_dims=(32, 24))
+    capture.start()
+    try:
+        _wait_frame_shape(capture, (24 * 3 // 2, 32))
+        # 给后台复核留出时间，尺寸一致时不应重启 ffmpeg
+        time.sleep(1.0)
+        assert capture.get_frame(timeout=1.0) is not None
+    finally:
+        capture.stop()
+    assert len(log_path.read_text().splitlines()) == 1
+
+
+def test_probe_without_cache_writes_entry(fake_tools, monkeypatch):
+    tmp_path, _ = fake_tools
+    monkeypatch.setenv("FAKE_STREAM_DIMS", "48x32")
+    capture = _make_capture(tmp_path)
+    assert capture._get_stream_info()
+    assert capture.get_stream_info() == (48, 32, 25.0)
+    with open(capture._cache_path, encoding="utf-8") as f:
+        assert json.load(f)[capture._cache_key] == [48, 32, 25.0]
+
+
+def _write_cache_entries(cache_path: str, worker: int, count: int) -> None:
+    for i in range(count):
+        capture = FrameCapture(f"rtsp://camera/{worker}/{i}")
+        capture._cache_path = cache_path
+        capture._update_stream_cache([32 + i, 24, 25.0])
+
+
+def test_concurrent_processes_keep_all_cache_entries(tmp_path):
+    # 多个工作进程同时写同一个缓存文件，各自的条目都不应丢失
+    cache_path = str(tmp_path / "dims.json")
+    ctx = multiprocessing.get_context("spawn")
+    workers = [
+        ctx.Process(target=_write_cache_entries, args=(cache_path, worker, 20))
+        for worker in range(4)
+    ]
+    for proc in workers:
+        proc.start()
+    for proc in workers:
+        proc.join(timeout=30)
+        assert proc.exitcode == 0
+    with open(cache_path, encoding="utf-8") as f:
+        assert len(json.load(f)) == 4 * 20
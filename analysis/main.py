@@ -1,5 +1,4 @@
 import os
-import signal
 
 # 解决 macOS 上 OpenMP 库冲突问题，必须在导入 cv2 等库之前设置
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
@@ -7,13 +6,22 @@ os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 import argparse
 import base64
 from concurrent import futures
+import ctypes
+import functools
+import itertools
+import json
 import logging
+import logging.handlers
+import multiprocessing
 import queue
+import select
+import signal
 import sys
 import threading
 import time
 from typing import Any
 import requests
+from requests.adapters import HTTPAdapter
 
 import grpc
 
@@ -21,15 +29,56 @@ import grpc
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 import logger
-from detect import MotionDetector, ObjectDetector
+from detect import MotionDetector, ObjectDetector, ONNXBackend
 from frame_capture import FrameCapture
 import cv2
+import numpy as np
+
+try:
+    # libjpeg-turbo 编码比 cv2.imencode 更快，未安装时回退到 OpenCV
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+try:
+    # 回调负载包含较大的 base64 快照，orjson 序列化明显快于标准库 json
+    import orjson
+except ImportError:
+    orjson = None
+
+# 摄像头任务表的分片数（需为 2 的幂）
+CAMERA_SHARDS = 16
+
+# 快照 JPEG 编码参数：固定质量，关闭 Huffman 优化与渐进式编码（可省去一遍额外扫描），
+# 两条编码路径都使用 4:2:0 色度采样
+_JPEG_QUALITY = 75
+_JPEG_PARAMS = [
+    cv2.IMWRITE_JPEG_QUALITY,
+    _JPEG_QUALITY,
+    cv2.IMWRITE_JPEG_OPTIMIZE,
+    0,
+    cv2.IMWRITE_JPEG_PROGRESSIVE,
+    0,
+]
+
+# 快照标注字体
+_LABEL_FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+# 事件快照最长边（像素）默认值，超过时缩小后再标注编码，0 表示不缩放
+# 缩放时回调中的检测框会按同一比例换算到快照坐标，可通过 --snapshot-max-side 调整
+SNAPSHOT_MAX_SIDE = 1280
 
 # 模型文件搜索候选路径（按优先级排序）
 MODEL_SEARCH_PATHS = [
+    ("../configs/owl.engine", "tensorrt"),
     ("../configs/owl.tflite", "tflite"),
+    ("../configs/owl_int8.onnx", "onnx"),
+    ("../configs/owl_static.onnx", "onnx"),
     ("../configs/owl.onnx", "onnx"),
+    ("./owl.engine", "tensorrt"),
     ("./owl.tflite", "tflite"),
+    ("./owl_int8.onnx", "onnx"),
+    ("./owl_static.onnx", "onnx"),
     ("./owl.onnx", "onnx"),
 ]
 
@@ -38,34 +87,93 @@ MODEL_SEARCH_PATHS = [
 import analysis_pb2
 import analysis_pb2_grpc
 
-
 slog = logging.getLogger("AI")
 
 # 全局配置
 GLOBAL_CONFIG = {
     "callback_url": "",
     "callback_secret": "",
+    "snapshot_max_side": SNAPSHOT_MAX_SIDE,
 }
 
+# 回调共用线程池与连接池：复用 keep-alive 连接，并限制并发，
+# 回调接口卡住时不会无限制地创建线程
+_CB_EXECUTOR = futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="callback")
+_CB_SESSION = requests.Session()
+_CB_ADAPTER = HTTPAdapter(pool_connections=16, pool_maxsize=64)
+_CB_SESSION.mount("http://", _CB_ADAPTER)
+_CB_SESSION.mount("https://", _CB_ADAPTER)
+# 排队与执行中的事件回调上限：线程池的任务队列不限长，回调接口变慢时
+# 带快照的事件会无限堆积，超过上限后丢弃新事件，内存占用保持有界
+_CB_MAX_PENDING_EVENTS = 32
+_CB_PENDING_EVENTS = threading.BoundedSemaphore(_CB_MAX_PENDING_EVENTS)
+_CB_DROPPED_EVENTS = itertools.count(1)
+
 # 保存父进程 PID，用于检测父进程是否退出
 _PARENT_PID = os.getppid()
+_PR_SET_PDEATHSIG = 1
+
+
+def _exit_on_parent_death(current_ppid: int) -> None:
+    slog.warning(
+        f"父进程已退出 (原 PID: {_PARENT_PID}, 当前 PPID: {current_ppid})，Python 进程退出"
+    )
+    os._exit(0)
+
+
+def _watch_parent_kqueue() -> None:
+    """macOS：阻塞在 kqueue 上等待父进程的 NOTE_EXIT 事件"""
+    kq = select.kqueue()
+    event = select.kevent(
+        _PARENT_PID,
+        filter=select.KQ_FILTER_PROC,
+        flags=select.KQ_EV_ADD,
+        fflags=select.KQ_NOTE_EXIT,
+    )
+    try:
+        kq.control([event], 0)
+    except OSError:
+        # 父进程在注册前已退出
+        _exit_on_parent_death(os.getppid())
+    while True:
+        if kq.control(None, 1):
+            _exit_on_parent_death(os.getppid())
 
 
 def _watch_parent_process():
     """
     监控父进程是否存活。当 Go 父进程退出后，Python 子进程应该自动退出，
     避免成为孤儿进程持续占用端口和资源。
+    Linux 由内核在父进程退出时发送 SIGTERM（PR_SET_PDEATHSIG），macOS 使用 kqueue，
+    均无需周期性轮询；其他平台才回退到每 3 秒检查一次 ppid。
+    需在主线程调用（SIGTERM 处理函数只能在主线程注册）
     """
-    while True:
-        time.sleep(3)
-        # 检查父进程是否还存在
-        # 如果父进程退出，当前进程的 ppid 会变成 1 (init/launchd) 或其他进程
-        current_ppid = os.getppid()
-        if current_ppid != _PARENT_PID:
-            slog.warning(
-                f"父进程已退出 (原 PID: {_PARENT_PID}, 当前 PPID: {current_ppid})，Python 进程退出"
-            )
-            os._exit(0)
+    if sys.platform.startswith("linux"):
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            # 注意：PDEATHSIG 跟随创建本进程的父线程，父进程中的该线程退出时也会触发
+            if libc.prctl(_PR_SET_PDEATHSIG, signal.SIGTERM) == 0:
+                signal.signal(signal.SIGTERM, lambda signum, frame: os._exit(0))
+                # 父进程在 prctl 之前就已退出时不会再收到信号
+                if os.getppid() != _PARENT_PID:
+                    _exit_on_parent_death(os.getppid())
+                return
+        except (OSError, AttributeError, ValueError) as e:
+            slog.warning(f"设置 PR_SET_PDEATHSIG 失败，回退到轮询: {e}")
+    elif hasattr(select, "kqueue"):
+        threading.Thread(target=_watch_parent_kqueue, daemon=True).start()
+        return
+
+    def _poll():
+        while True:
+            time.sleep(3)
+            # 检查父进程是否还存在
+            # 如果父进程退出，当前进程的 ppid 会变成 1 (init/launchd) 或其他进程
+            current_ppid = os.getppid()
+            if current_ppid != _PARENT_PID:
+                _exit_on_parent_death(current_ppid)
+
+    threading.Thread(target=_poll, daemon=True).start()
 
 
 class CameraTask:
@@ -89,11 +197,32 @@ class CameraTask:
         self.last_error = ""
         self._stop_event = threading.Event()
         self._thread: threading.Thread | None = None
+        # 标注、JPEG 编码与 base64 放到编码线程执行，避免阻塞下一帧的检测；
+        # 队列满时丢弃最旧的一帧，回调接收端变慢时流水线仍保持实时
+        self._encode_queue: queue.Queue = queue.Queue(maxsize=2)
+        self._encoder_thread: threading.Thread | None = None
+        # 缩小后的快照缓冲区，仅编码线程使用，分辨率不变时跨事件复用
+        self._draw_buf: np.ndarray | None = None
+
+        # 任务配置在运行期间不变，解析一次，避免每帧重复查找与构造标签列表
+        # ROI 以元组保存：MotionDetector 按 (w, h, tuple(roi_points)) 缓存降采样后的掩码，
+        # 传入元组时 tuple() 直接返回原对象，每帧无需复制坐标列表
+        roi_points = config.get("roi_points")
+        self._roi_points = tuple(roi_points) if roi_points else None
+        self._threshold = float(config.get("threshold", 0.5))
+        labels = config.get("labels")
+        if labels and isinstance(labels, list):
+            self._safe_labels: list[str] | None = [str(l) for l in labels]
+        else:
+            self._safe_labels = None
+        # 没有回调地址时事件无处可发，检测后直接跳过标注与编码
+        self._has_callback = bool(config.get("callback_url"))
+        self._snapshot_max_side = int(
+            config.get("snapshot_max_side", SNAPSHOT_MAX_SIDE) or 0
+        )
 
-        self.frame_queue = queue.Queue(maxsize=1)
         self.capture = FrameCapture(
             rtsp_url,
-            self.frame_queue,
             config.get("detect_fps", 5),
             config.get("retry_limit", 10),
         )
@@ -104,6 +233,8 @@ class CameraTask:
         self._stop_event.clear()
         self._thread = threading.Thread(target=self._analysis_loop, daemon=True)
         self._thread.start()
+        self._encoder_thread = threading.Thread(target=self._encode_loop, daemon=True)
+        self._encoder_thread.start()
         slog.info(f"CameraTask started for {self.camera_id}")
 
     def stop(self):
@@ -112,62 +243,76 @@ class CameraTask:
         self.capture.stop()
         if self._thread:
             self._thread.join(timeout=2)
+        if self._encoder_thread:
+            self._encoder_thread.join(timeout=2)
+        # 共享检测器按摄像头缓存了上一次结果，停止后清除，避免同名摄像头重启时复用旧框
+        self.detector.forget(self.camera_id)
         slog.info(f"CameraTask stopped for {self.camera_id}")
 
+    def get_stream_info(self):
+        return self.capture.get_stream_info()
+
+    def wait_stream_info(self, timeout: float | None = None):
+        return self.capture.wait_stream_info(timeout)
+
     def _analysis_loop(self):
         error_streak = 0
         retry_limit = int(self.config.get("retry_limit", 10))
-
-        while not self._stop_event.is_set():
+        # 热循环中用到的属性与方法先绑定为局部变量，每帧省去重复的属性查找
+        stop_event = self._stop_event
+        capture = self.capture
+        get_frame = capture.get_frame
+        to_bgr = capture.to_bgr
+        detect_with_motion = self.detector.detect_with_motion
+        send_detection_callback = self._send_detection_callback
+        camera_id = self.camera_id
+        motion_detector = self.motion_detector
+        threshold = self._threshold
+        label_filter = self._safe_labels
+        roi_points = self._roi_points
+
+        while not stop_event.is_set():
             # 检查 FrameCapture 是否已达到重试上限
-            if self.capture.is_failed:
+            if capture.is_failed:
                 self.status = "error"
-                self.last_error = self.capture.last_error
+                self.last_error = capture.last_error
                 self._send_stopped_callback("capture_failed", self.last_error)
                 slog.error(
-                    f"CameraTask {self.camera_id} 因帧捕获失败而停止: {self.last_error}"
+                    f"CameraTask {camera_id} 因帧捕获失败而停止: {self.last_error}"
                 )
                 break
 
             try:
-                try:
-                    frame = self.frame_queue.get(timeout=2.0)
-                except queue.Empty:
-                    slog.debug("CameraTask frame queue empty, skipping")
+                frame = get_frame(timeout=2.0)
+                if frame is None:
+                    slog.debug("CameraTask no new frame, skipping")
                     continue
+                # 只对实际处理的帧做颜色转换，被丢弃的帧无需转换
+                frame = to_bgr(frame)
 
                 error_streak = 0
                 self.frames_processed += 1
 
-                roi_points = self.config.get("roi_points")
-                motion_boxes, has_motion = self.motion_detector.detect(
-                    frame, self.camera_id, roi_points
-                )
-
-                if not has_motion:
-                    continue
-
                 try:
-                    labels = self.config.get("labels")
-                    if labels and isinstance(labels, list):
-                        safe_labels = [str(l) for l in labels]
-                    else:
-                        safe_labels = None
-
-                    detections, _ = self.detector.detect(
+                    # 运动检测作为门控：无运动时跳过推理，有运动时只检测运动区域
+                    detections, _, has_motion = detect_with_motion(
                         frame,
-                        threshold=self.config.get("threshold", 0.5),
-                        label_filter=safe_labels,
-                        # 暂时只支持全图检测，未来优化可以只检测 motion_boxes 区域
-                        regions=None,
+                        camera_id,
+                        motion_detector,
+                        threshold=threshold,
+                        label_filter=label_filter,
+                        roi_points=roi_points,
                     )
                 except Exception as e:
-                    slog.error(f"CameraTask labels error: {e}")
+                    slog.error(f"CameraTask detect error: {e}")
+                    continue
+
+                if not has_motion:
                     continue
 
                 if not detections:
                     continue
-                self._send_detection_callback(detections, frame)
+                send_detection_callback(detections, frame)
             except Exception as e:
                 slog.error(f"CameraTask analysis loop error: {e}")
                 error_streak += 1
@@ -175,55 +320,73 @@ class CameraTask:
                 if error_streak >= retry_limit:
                     self.status = "error"
                     self._send_stopped_callback("error", self.last_error)
-                    self.capture.stop()
+                    capture.stop()
                     break
-                # 防止 cpu 在异常里空转
-                time.sleep(1)
+                # 防止 cpu 在异常里空转，停止时立即返回
+                stop_event.wait(1)
 
     def _send_detection_callback(self, detections, frame):
-        timestamp = int(time.time() * 1000)
-        draw_frame = frame.copy()
-        for det in detections:
-            box = det["box"]
-            label = f"{det['label']} {det['confidence']:.2f}"
-
-            # 坐标
-            p1 = (box["x_min"], box["y_min"])
-            p2 = (box["x_max"], box["y_max"])
-
-            # 画矩形框 (红色，线宽2)
-            cv2.rectangle(draw_frame, p1, p2, (0, 0, 255), 2)
-
-            # 画文字背景条，防止文字看不清
-            t_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)[0]
-            p2_text = (p1[0] + t_size[0], p1[1] - t_size[1] - 3)
-            cv2.rectangle(draw_frame, p1, p2_text, (0, 0, 255), -1)  # -1 表示实心填充
-
-            # 画文字 (白色)
-            cv2.putText(
-                draw_frame,
-                label,
-                (p1[0], p1[1] - 2),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.5,
-                (255, 255, 255),
-                1,
+        if not self._has_callback:
+            return
+        item = (int(time.time() * 1000), detections, frame)
+        try:
+            self._encode_queue.put_nowait(item)
+        except queue.Full:
+            try:
+                self._encode_queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self._encode_queue.put_nowait(item)
+            except queue.Full:
+                slog.debug(f"CameraTask {self.camera_id} 编码队列已满，丢弃事件")
+
+    def _encode_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                timestamp, detections, frame = self._encode_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self._encode_and_send(timestamp, detections, frame)
+            except Exception as e:
+                slog.error(f"CameraTask encode error: {e}")
+
+    def _encode_and_send(self, timestamp, detections, frame):
+        # 分析线程交出帧后不再使用，可直接在原帧上标注；
+        # 超过 snapshot_max_side 时先缩小到复用的缓冲区，减少拷贝与编码像素
+        h, w = frame.shape[:2]
+        max_side = self._snapshot_max_side
+        scale = 1.0
+        if max_side > 0 and max(h, w) > max_side:
+            scale = max_side / max(h, w)
+            size = (max(1, round(w * scale)), max(1, round(h * scale)))
+            shape = (size[1], size[0]) + frame.shape[2:]
+            if self._draw_buf is None or self._draw_buf.shape != shape:
+                self._draw_buf = np.empty(shape, dtype=frame.dtype)
+            draw_frame = cv2.resize(
+                frame, size, dst=self._draw_buf, interpolation=cv2.INTER_AREA
             )
-        success, buffer = cv2.imencode(".jpg", draw_frame)
+        else:
+            draw_frame = frame
+        draw_detections(draw_frame, detections, scale)
+        buffer = encode_jpeg(draw_frame)
         snapshot_b64 = ""
-        if success:
-            snapshot_b64 = base64.b64encode(buffer).decode("utf-8")
+        if buffer is not None:
+            snapshot_b64 = base64.b64encode(buffer).decode("ascii")
 
         payload = {
             "camera_id": self.camera_id,
             "timestamp": timestamp,
-            "detections": detections,
+            "detections": (
+                scale_detections(detections, scale) if scale != 1.0 else detections
+            ),
             "snapshot": snapshot_b64,
-            "snapshot_width": frame.shape[1],
-            "snapshot_height": frame.shape[0],
+            "snapshot_width": draw_frame.shape[1],
+            "snapshot_height": draw_frame.shape[0],
         }
 
-        send_callback(self.config, "/events", payload)
+        send_callback(self.config, "/events", payload, drop_when_busy=True)
 
     def _send_stopped_callback(self, reason, message):
         payload = {
@@ -235,6 +398,175 @@ class CameraTask:
         send_callback(self.config, "/stopped", payload)
 
 
+def _task_status(task) -> tuple:
+    return (
+        task.status,
+        task.frames_processed,
+        task.retry_count,
+        task.last_error,
+        task.get_stream_info(),
+    )
+
+
+def _camera_worker(
+    camera_id: str,
+    rtsp_url: str,
+    config: dict[str, Any],
+    model_path: str,
+    device: str,
+    motion_opencl: bool,
+    cameras: int,
+    intra_op_threads: int,
+    stop_event,
+    status_queue,
+    log_queue,
+    log_level: int,
+):
+    """摄像头工作进程：加载独立的检测器并运行 CameraTask，定期回报状态"""
+    # 日志统一交给主进程写入，避免多个进程同时轮转同一日志文件
+    root_logger = logging.getLogger()
+    root_logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    root_logger.setLevel(log_level)
+    _watch_parent_process()
+
+    ObjectDetector.configure_threads(cameras, intra_op_threads)
+    detector = ObjectDetector(model_path, device=device)
+    task = CameraTask(
+        camera_id,
+        rtsp_url=rtsp_url,
+        config=config,
+        detector=detector,
+        motion_detector=MotionDetector(use_opencl=motion_opencl),
+    )
+
+    # 先启动拉流，流信息探测与模型加载并行，探测完成后立即回报分辨率，
+    # 主进程的 StartCamera 不必等模型加载完才能拿到宽高
+    def _report_stream_info():
+        task.wait_stream_info()
+        status_queue.put(_task_status(task))
+
+    task.capture.start()
+    threading.Thread(target=_report_stream_info, daemon=True).start()
+    if not detector.load_model():
+        task.capture.stop()
+        status_queue.put(("error", 0, 0, "模型加载失败", task.get_stream_info()))
+        return
+
+    task.start()
+    try:
+        while not stop_event.wait(1.0):
+            status_queue.put(_task_status(task))
+            if task._thread is None or not task._thread.is_alive():
+                break
+    finally:
+        if task._thread is not None and task._thread.is_alive():
+            task.stop()
+        status_queue.put(_task_status(task))
+
+
+class CameraProcessTask:
+    """
+    在独立进程中运行 CameraTask，多路摄像头的 Python 层逻辑不再争用同一个 GIL
+    每个进程加载各自的模型，拉流、检测与回调都在子进程内完成，主进程只汇总状态
+    """
+
+    def __init__(
+        self,
+        camera_id: str,
+        rtsp_url: str,
+        config: dict[str, Any],
+        model_path: str,
+        device: str,
+        motion_opencl: bool,
+        cameras: int,
+        intra_op_threads: int,
+        log_queue,
+    ) -> None:
+        self.camera_id = camera_id
+        self.rtsp_url = rtsp_url
+        self.config = config
+        self.status = "initializing"
+        self.frames_processed = 0
+        self.retry_count = 0
+        self.last_error = ""
+        self._stream_info = (0, 0, 0.0)
+        self._stream_ready = threading.Event()
+
+        # fork 会复制 gRPC 等后台线程的状态，子进程一律使用 spawn 启动
+        ctx = multiprocessing.get_context("spawn")
+        self._stop_event = ctx.Event()
+        self._status_queue = ctx.Queue()
+        self._proc = ctx.Process(
+            target=_camera_worker,
+            args=(
+                camera_id,
+                rtsp_url,
+                config,
+                model_path,
+                device,
+                motion_opencl,
+                cameras,
+                intra_op_threads,
+                self._stop_event,
+                self._status_queue,
+                log_queue,
+                logging.getLogger().level,
+            ),
+            daemon=True,
+        )
+        self._monitor: threading.Thread | None = None
+
+    def start(self):
+        self.status = "running"
+        self._proc.start()
+        self._monitor = threading.Thread(target=self._monitor_loop, daemon=True)
+        self._monitor.start()
+        slog.info(
+            f"CameraProcessTask started for {self.camera_id} (pid: {self._proc.pid})"
+        )
+
+    def stop(self):
+        self.status = "stopping"
+        self._stop_event.set()
+        self._proc.join(timeout=5)
+        if self._proc.is_alive():
+            self._proc.terminate()
+            self._proc.join(timeout=2)
+        if self._monitor:
+            self._monitor.join(timeout=2)
+        slog.info(f"CameraProcessTask stopped for {self.camera_id}")
+
+    def get_stream_info(self):
+        return self._stream_info
+
+    def wait_stream_info(self, timeout: float | None = None):
+        self._stream_ready.wait(timeout)
+        return self._stream_info
+
+    def _monitor_loop(self):
+        while True:
+            try:
+                item = self._status_queue.get(timeout=1.0)
+            except queue.Empty:
+                if not self._proc.is_alive():
+                    break
+                continue
+            status, frames, retries, last_error, self._stream_info = item
+            self.frames_processed = frames
+            self.retry_count = retries
+            self.last_error = last_error
+            if not self._stop_event.is_set():
+                self.status = status
+            if self._stream_info[0] > 0 or status == "error":
+                self._stream_ready.set()
+
+        if not self._stop_event.is_set() and self.status == "running":
+            self.status = "error"
+            self.last_error = f"工作进程异常退出 (exitcode: {self._proc.exitcode})"
+            slog.error(f"CameraProcessTask {self.camera_id}: {self.last_error}")
+        self._stream_ready.set()
+
+
 class HealthServicer(analysis_pb2_grpc.HealthServicer):
     def __init__(self, servicer):
         self._servicer = servicer
@@ -250,28 +582,79 @@ class HealthServicer(analysis_pb2_grpc.HealthServicer):
 
 
 class AnalysisServiceServicer(analysis_pb2_grpc.AnalysisServiceServicer):
-    def __init__(self, model_path):
-        self._camera_tasks: dict[str, CameraTask] = {}
-        self._lock = threading.Lock()
+    def __init__(
+        self,
+        model_path,
+        device="auto",
+        motion_opencl=False,
+        camera_processes=False,
+        intra_op_threads=0,
+    ):
+        # 任务表按 camera_id 分片，各分片独立加锁，不同摄像头的启停互不阻塞
+        self._shards: list[dict[str, CameraTask | CameraProcessTask]] = [
+            {} for _ in range(CAMERA_SHARDS)
+        ]
+        self._shard_locks = [threading.Lock() for _ in range(CAMERA_SHARDS)]
         self._is_ready = False
         self._start_time = time.time()
+        # 收到退出信号后置位，不再接受新的摄像头任务
+        self._shutdown = threading.Event()
+        self._model_path = model_path
+        self._device = device
+        self._motion_opencl = motion_opencl
+        self._intra_op_threads = intra_op_threads
+
+        # 多进程模式下子进程的日志经队列转交主进程已有的 handler 输出
+        self._camera_processes = camera_processes
+        self._log_queue = None
+        self._log_listener = None
+        if camera_processes:
+            self._log_queue = multiprocessing.get_context("spawn").Queue()
+            self._log_listener = logging.handlers.QueueListener(
+                self._log_queue,
+                *logging.getLogger().handlers,
+                respect_handler_level=True,
+            )
+            self._log_listener.start()
 
-        self.object_detector = ObjectDetector(model_path)
-        self.motion_detector = MotionDetector()
+        # 多进程模式下每个子进程加载各自的模型，主进程不再加载一份
+        self.object_detector: ObjectDetector | None = None
+        if not camera_processes:
+            self.object_detector = ObjectDetector(model_path, device=device)
 
     def is_ready(self) -> bool:
         return self._is_ready
 
+    def _shard(self, camera_id: str) -> int:
+        return hash(camera_id) & (CAMERA_SHARDS - 1)
+
+    def _task_count(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def _snapshot_tasks(self) -> list[tuple[str, CameraTask | CameraProcessTask]]:
+        """逐个分片短暂加锁复制任务列表"""
+        items = []
+        for shard, lock in zip(self._shards, self._shard_locks):
+            with lock:
+                items.extend(shard.items())
+        return items
+
     def initialize(self):
         slog.info("AnalysisService initializing...")
-        success = self.object_detector.load_model()
+        if self.object_detector is None:
+            # 模型由各摄像头子进程加载，这里只确认模型文件存在
+            success = os.path.exists(self._model_path)
+            if not success:
+                slog.error(f"模型文件不存在: {self._model_path}")
+        else:
+            success = self.object_detector.load_model()
         self._is_ready = success
 
         if not success:
             slog.error("AnalysisService initialization failed")
             return
         slog.info("AnalysisService initialized")
-        threading.Thread(target=send_started_callback).start()
+        _CB_EXECUTOR.submit(send_started_callback)
 
     def StartCamera(self, request, context):
         if not self._is_ready:
@@ -281,10 +664,18 @@ class AnalysisServiceServicer(analysis_pb2_grpc.AnalysisServiceServicer):
                 success=False, message="model loadding"
             )
         camera_id = request.camera_id
-        with self._lock:
-            if camera_id in self._camera_tasks:
+        index = self._shard(camera_id)
+        tasks = self._shards[index]
+        with self._shard_locks[index]:
+            if self._shutdown.is_set():
+                context.set_details("service shutting down")
+                context.set_code(grpc.StatusCode.UNAVAILABLE)
+                return analysis_pb2.StartCameraResponse(
+                    success=False, message="service shutting down"
+                )
+            if camera_id in tasks:
                 slog.info(
-                    f"Camera {camera_id} already exists, status: {self._camera_tasks[camera_id].status}"
+                    f"Camera {camera_id} already exists, status: {tasks[camera_id].status}"
                 )
                 return analysis_pb2.StartCameraResponse(
                     success=True, message="任务已运行"
@@ -305,26 +696,35 @@ class AnalysisServiceServicer(analysis_pb2_grpc.AnalysisServiceServicer):
                 "retry_limit": request.retry_limit,
                 "callback_url": cb_url,
                 "callback_secret": cb_secret,
+                "snapshot_max_side": GLOBAL_CONFIG["snapshot_max_side"],
             }
 
-            task = CameraTask(
-                camera_id,
-                rtsp_url=request.rtsp_url,
-                config=config,
-                detector=self.object_detector,
-                motion_detector=self.motion_detector,
-            )
+            if self._camera_processes:
+                task = CameraProcessTask(
+                    camera_id,
+                    rtsp_url=request.rtsp_url,
+                    config=config,
+                    model_path=self._model_path,
+                    device=self._device,
+                    motion_opencl=self._motion_opencl,
+                    cameras=self._task_count() + 1,
+                    intra_op_threads=self._intra_op_threads,
+                    log_queue=self._log_queue,
+                )
+            else:
+                task = CameraTask(
+                    camera_id,
+                    rtsp_url=request.rtsp_url,
+                    config=config,
+                    detector=self.object_detector,
+                    # 每路摄像头独立的运动检测器：背景模型与缓冲区随任务创建和释放
+                    motion_detector=MotionDetector(use_opencl=self._motion_opencl),
+                )
             task.start()
-            self._camera_tasks[camera_id] = task
-
-        timeout = 5.0
-        start = time.time()
-        w, h, fps = 0, 0, 0.0
-        while time.time() - start < timeout:
-            w, h, fps = task.capture.get_stream_info()
-            if w > 0:
-                break
-            time.sleep(0.5)
+            tasks[camera_id] = task
+
+        # 多进程模式下由子进程探测后回报；5 秒内仍未探测到流信息时宽高为 0
+        w, h, fps = task.wait_stream_info(timeout=5.0)
         return analysis_pb2.StartCameraResponse(
             success=True,
             message="任务已启动",
@@ -335,40 +735,126 @@ class AnalysisServiceServicer(analysis_pb2_grpc.AnalysisServiceServicer):
 
     def StopCamera(self, request, context):
         camera_id = request.camera_id
-        with self._lock:
-            if camera_id not in self._camera_tasks:
-                return analysis_pb2.StopCameraResponse(
-                    success=False, message="Camera not found"
-                )
-
-            task = self._camera_tasks.pop(camera_id)
-            task.stop()
-            return analysis_pb2.StopCameraResponse(success=True, message="任务已停止")
+        index = self._shard(camera_id)
+        with self._shard_locks[index]:
+            task = self._shards[index].pop(camera_id, None)
+        if task is None:
+            return analysis_pb2.StopCameraResponse(
+                success=False, message="Camera not found"
+            )
+        # 在锁外等待任务退出，避免阻塞其他摄像头的启停与状态查询
+        task.stop()
+        return analysis_pb2.StopCameraResponse(success=True, message="任务已停止")
+
+    def is_shutting_down(self) -> bool:
+        return self._shutdown.is_set()
+
+    def shutdown(self):
+        """停止全部摄像头任务，各任务并行等待退出，可重复调用"""
+        self._shutdown.set()
+        tasks = []
+        for shard, lock in zip(self._shards, self._shard_locks):
+            with lock:
+                tasks.extend(shard.values())
+                shard.clear()
+        if tasks:
+            slog.info(f"正在停止 {len(tasks)} 个摄像头任务...")
+            with futures.ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+                list(executor.map(lambda task: task.stop(), tasks))
+        if self._log_listener is not None:
+            self._log_listener.stop()
+            self._log_listener = None
 
     def GetStatus(self, request, context):
         response = analysis_pb2.StatusResponse()
         response.is_ready = self._is_ready
-        response.stats.active_streams = len(self._camera_tasks)
         response.stats.uptime_seconds = int(time.time() - self._start_time)
 
-        with self._lock:
-            for cid, task in self._camera_tasks.items():
-                cam_status = analysis_pb2.CameraStatus(
-                    camera_id=cid,
-                    status=task.status,
-                    frames_processed=task.frames_processed,
-                    retry_count=task.retry_count,
-                    last_error=task.last_error,
-                )
-                response.cameras.append(cam_status)
+        # 先取快照再在锁外构造 protobuf
+        tasks = self._snapshot_tasks()
+        response.stats.active_streams = len(tasks)
+        for cid, task in tasks:
+            cam_status = analysis_pb2.CameraStatus(
+                camera_id=cid,
+                status=task.status,
+                frames_processed=task.frames_processed,
+                retry_count=task.retry_count,
+                last_error=task.last_error,
+            )
+            response.cameras.append(cam_status)
         return response
 
 
-def send_callback(config: dict, path: str, payload: dict):
+def draw_detections(image, detections, scale: float = 1.0):
+    """在图像上原地绘制检测框与标签，scale 为检测坐标到图像坐标的缩放比例"""
+    if not detections:
+        return
+    # 坐标（按快照缩放比例换算，检测结果本身仍为原图坐标）
+    rects = []
+    for det in detections:
+        box = det["box"]
+        rects.append(
+            (
+                round(box["x_min"] * scale),
+                round(box["y_min"] * scale),
+                round(box["x_max"] * scale),
+                round(box["y_max"] * scale),
+            )
+        )
+    # 所有检测框一次 polylines 画完 (红色，线宽2)
+    corners = np.array(rects, dtype=np.int32)[:, [0, 1, 2, 1, 2, 3, 0, 3]]
+    cv2.polylines(image, corners.reshape(-1, 4, 2), True, (0, 0, 255), 2)
+
+    for det, (x1, y1, _, _) in zip(detections, rects):
+        label = f"{det['label']} {det['confidence']:.2f}"
+        # 画文字背景条，防止文字看不清
+        t_w, t_h = _label_size(label)
+        cv2.rectangle(image, (x1, y1), (x1 + t_w, y1 - t_h - 3), (0, 0, 255), -1)
+        # 画文字 (白色)
+        cv2.putText(image, label, (x1, y1 - 2), _LABEL_FONT, 0.5, (255, 255, 255), 1)
+
+
+def scale_detections(detections, scale: float):
+    """返回按 scale 换算坐标后的检测结果副本，使检测框与缩小后的快照对齐"""
+    scaled = []
+    for det in detections:
+        box = det["box"]
+        det = dict(det)
+        det["box"] = {key: round(value * scale) for key, value in box.items()}
+        det["area"] = round(det["area"] * scale * scale)
+        scaled.append(det)
+    return scaled
+
+
+@functools.lru_cache(maxsize=1024)
+def _label_size(label: str) -> tuple[int, int]:
+    # 标签文本只有类别名与两位置信度的组合，缓存 getTextSize 的结果
+    return cv2.getTextSize(label, _LABEL_FONT, 0.5, 1)[0]
+
+
+def encode_jpeg(image):
+    """将 BGR 图像编码为 JPEG，失败时返回 None"""
+    if simplejpeg is not None:
+        return simplejpeg.encode_jpeg(
+            image, quality=_JPEG_QUALITY, colorspace="BGR", colorsubsampling="420"
+        )
+    success, buffer = cv2.imencode(".jpg", image, _JPEG_PARAMS)
+    return buffer if success else None
+
+
+def dumps_payload(payload: dict) -> bytes:
+    """将回调负载序列化为 JSON 字节串"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+def send_callback(config: dict, path: str, payload: dict, drop_when_busy: bool = False):
     """
     发送回调到指定路径，路径会拼接到 callback_url 后面。
     例如: callback_url=http://127.0.0.1:15123, path=/events
     最终请求: POST http://127.0.0.1:15123/events
+    drop_when_busy 为 True 时（检测事件），待发送的事件已达上限则直接丢弃
     """
     url = config.get("callback_url", "")
     secret = config.get("callback_secret", "")
@@ -380,20 +866,44 @@ def send_callback(config: dict, path: str, payload: dict):
     if secret:
         headers["Authorization"] = secret
 
+    if not drop_when_busy:
+        try:
+            _CB_EXECUTOR.submit(_post_callback, full_url, payload, headers, path)
+        except Exception as e:
+            slog.error(f"Failed to send callback to {path}: {e}")
+        return
+
+    if not _CB_PENDING_EVENTS.acquire(blocking=False):
+        dropped = next(_CB_DROPPED_EVENTS)
+        if dropped == 1 or dropped % 100 == 0:
+            slog.warning(
+                f"回调接口处理过慢，待发送事件已达 {_CB_MAX_PENDING_EVENTS} 个，"
+                f"已累计丢弃 {dropped} 个事件"
+            )
+        return
+    try:
+        _CB_EXECUTOR.submit(_post_event_callback, full_url, payload, headers, path)
+    except Exception as e:
+        _CB_PENDING_EVENTS.release()
+        slog.error(f"Failed to send callback to {path}: {e}")
+
+
+def _post_callback(full_url: str, payload: dict, headers: dict, path: str):
     try:
-        threading.Thread(
-            target=requests.post,
-            args=(full_url,),
-            kwargs={
-                "json": payload,
-                "headers": headers,
-                "timeout": 5.0,
-            },
-        ).start()
+        _CB_SESSION.post(
+            full_url, data=dumps_payload(payload), headers=headers, timeout=5.0
+        )
     except Exception as e:
         slog.error(f"Failed to send callback to {path}: {e}")
 
 
+def _post_event_callback(full_url: str, payload: dict, headers: dict, path: str):
+    try:
+        _post_callback(full_url, payload, headers, path)
+    finally:
+        _CB_PENDING_EVENTS.release()
+
+
 def send_started_callback():
     """
     向 Go 服务发送启动通知，用于确认 Python 进程与 Go 服务的连接是否正常。
@@ -420,21 +930,28 @@ def send_started_callback():
     for attempt in range(1, max_retries + 1):
         slog.info(f"Sending started callback (attempt {attempt}/{max_retries})...")
         try:
-            resp = requests.post(full_url, json=payload, headers=headers, timeout=5)
-            if resp.status_code == 404 and attempt == max_retries - 1:
-                slog.error(f"回调接口返回 404，Go 服务可能已停止，退出 Python 进程")
-                os._exit(1)
-            if resp.ok:
-                slog.info("启动通知发送成功")
-                return
-            slog.warning(f"启动通知返回非成功状态: {resp.status_code} {full_url}")
+            resp = _CB_SESSION.post(
+                full_url, data=dumps_payload(payload), headers=headers, timeout=5
+            )
+            try:
+                # 回调接口不存在时重试也没有意义，任何一次 404 都直接退出
+                if resp.status_code == 404:
+                    slog.error("回调接口返回 404，Go 服务可能已停止，退出 Python 进程")
+                    os._exit(1)
+                if resp.ok:
+                    slog.info("启动通知发送成功")
+                    return
+                slog.warning(f"启动通知返回非成功状态: {resp.status_code} {full_url}")
+            finally:
+                resp.close()
         except requests.exceptions.ConnectionError as e:
             slog.warning(f"发送启动通知失败 (连接错误): {e}")
         except Exception as e:
             slog.error(f"发送启动通知失败: {e}")
 
         if attempt < max_retries:
-            time.sleep(retry_interval)
+            # 指数退避：2s、4s ...
+            time.sleep(retry_interval * 2 ** (attempt - 1))
 
     slog.error(f"启动通知发送失败，已重试 {max_retries} 次")
 
@@ -460,17 +977,47 @@ def send_keepalive_callback(stats: dict):
     }
 
     try:
-        requests.post(full_url, json=payload, headers=headers, timeout=5)
+        _CB_EXECUTOR.submit(_post_keepalive, full_url, payload, headers)
     except Exception as e:
         slog.debug(f"Failed to send keepalive callback: {e}")
 
 
-def serve(port, model_path):
-    # 启动父进程监控线程，确保 Go 退出时 Python 也退出
-    threading.Thread(target=_watch_parent_process, daemon=True).start()
+def _post_keepalive(full_url: str, payload: dict, headers: dict):
+    try:
+        _CB_SESSION.post(
+            full_url, data=dumps_payload(payload), headers=headers, timeout=5
+        )
+    except Exception as e:
+        slog.debug(f"Failed to send keepalive callback: {e}")
+
 
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=20))
-    servicer = AnalysisServiceServicer(model_path)
+def serve(
+    port,
+    model_path,
+    device="auto",
+    motion_opencl=False,
+    camera_processes=False,
+    intra_op_threads=0,
+):
+    # 启动父进程监控，确保 Go 退出时 Python 也退出
+    _watch_parent_process()
+
+    # RPC 都很轻量，工作线程按核数设置；限制排队中的并发 RPC，避免请求无限堆积
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=max(8, (os.cpu_count() or 4) * 2)),
+        maximum_concurrent_rpcs=64,
+        options=[
+            ("grpc.keepalive_time_ms", 30000),
+            ("grpc.keepalive_timeout_ms", 10000),
+        ],
+    )
+    servicer = AnalysisServiceServicer(
+        model_path,
+        device=device,
+        motion_opencl=motion_opencl,
+        camera_processes=camera_processes,
+        intra_op_threads=intra_op_threads,
+    )
     analysis_pb2_grpc.add_AnalysisServiceServicer_to_server(servicer, server)
 
     health_servicer = HealthServicer(servicer)
@@ -480,22 +1027,47 @@ def serve(port, model_path):
     server.start()
     slog.info(f"AnalysisService started: 0.0.0.0:{port}")
 
+    def _handle_sigterm(signum, frame):
+        # 第二次收到 SIGTERM 时不再等待，直接退出
+        if servicer.is_shutting_down():
+            os._exit(0)
+        slog.info("收到 SIGTERM，开始退出...")
+        # 先拒绝新任务并停止已有摄像头任务，再给进行中的 RPC 留出宽限期
+        servicer.shutdown()
+        server.stop(5)
+
+    # 覆盖 _watch_parent_process 注册的直接退出处理：父进程退出（PDEATHSIG）
+    # 与外部发送的 SIGTERM 都走下面的有序退出流程
+    signal.signal(signal.SIGTERM, _handle_sigterm)
+
     threading.Thread(target=servicer.initialize).start()
 
     try:
         server.wait_for_termination()
     except KeyboardInterrupt:
         server.stop(0)
+    finally:
+        servicer.shutdown()
+        slog.info("AnalysisService stopped")
 
 
-def discover_model(model_arg: str) -> str:
+def discover_model(model_arg: str, device: str = "auto") -> str:
     """
     自动发现可用模型文件
-    优先级：../configs/owl.tflite > ../configs/owl.onnx > ./owl.tflite > ./owl.onnx > 命令行参数
+    优先级：../configs/owl.engine > ../configs/owl.tflite > ../configs/owl_int8.onnx
+    > ../configs/owl_static.onnx > ../configs/owl.onnx > ./owl.engine > ./owl.tflite
+    > ./owl_int8.onnx > ./owl_static.onnx > ./owl.onnx > 命令行参数
+    INT8 量化模型（quantize.py 生成）只在 CPU 上有加速效果，
+    指定 cuda 或 auto 且 GPU 后端可用时跳过
     """
     script_dir = os.path.dirname(os.path.abspath(__file__))
+    skip_int8 = device == "cuda" or (
+        device == "auto" and ONNXBackend.gpu_providers_available()
+    )
 
     for rel_path, _ in MODEL_SEARCH_PATHS:
+        if skip_int8 and "_int8" in rel_path:
+            continue
         full_path = os.path.normpath(os.path.join(script_dir, rel_path))
         if os.path.exists(full_path):
             slog.info(f"发现模型文件: {full_path}")
@@ -520,6 +1092,35 @@ def main():
         help="回调基础URL，各回调路由会自动拼接",
     )
     parser.add_argument("--callback-secret", type=str, default="", help="回调秘钥")
+    parser.add_argument(
+        "--device",
+        type=str,
+        default="auto",
+        choices=["auto", "cpu", "cuda"],
+        help="ONNX 推理设备，auto 时有 CUDA 则优先使用",
+    )
+    parser.add_argument(
+        "--motion-opencl",
+        action="store_true",
+        help="运动检测使用 OpenCL（核显等）加速",
+    )
+    parser.add_argument(
+        "--intra-op-threads",
+        type=int,
+        default=0,
+        help="ONNX 算子内线程数，0 表示由 onnxruntime 决定；同机运行多个分析进程时可调小",
+    )
+    parser.add_argument(
+        "--camera-processes",
+        action="store_true",
+        help="每路摄像头在独立进程中运行（各自加载模型），多路时可利用多核",
+    )
+    parser.add_argument(
+        "--snapshot-max-side",
+        type=int,
+        default=SNAPSHOT_MAX_SIDE,
+        help="事件快照最长边（像素），超过时缩小后再标注编码，0 表示不缩放",
+    )
     parser.add_argument(
         "--log-level",
         type=str,
@@ -531,15 +1132,26 @@ def main():
 
     GLOBAL_CONFIG["callback_url"] = args.callback_url
     GLOBAL_CONFIG["callback_secret"] = args.callback_secret
+    GLOBAL_CONFIG["snapshot_max_side"] = max(0, args.snapshot_max_side)
+
+    if args.intra_op_threads > 0:
+        ObjectDetector.configure_threads(intra_op_threads=args.intra_op_threads)
 
     # 自动发现模型文件
-    model_path = discover_model(args.model)
+    model_path = discover_model(args.model, args.device)
 
     slog.debug(
-        f"log level: {args.log_level}, model: {model_path}, callback url: {args.callback_url}, callback secret: {args.callback_secret}"
+        f"log level: {args.log_level}, model: {model_path}, device: {args.device}, callback url: {args.callback_url}, callback secret: {args.callback_secret}"
     )
 
-    serve(args.port, model_path)
+    serve(
+        args.port,
+        model_path,
+        args.device,
+        args.motion_opencl,
+        args.camera_processes,
+        args.intra_op_threads,
+    )
 
 
 if __name__ == "__main__":
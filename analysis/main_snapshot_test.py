@@ -0,0 +1,76 @@
+"""
+事件快照缩放与缓冲区复用测试
+使用方法: python -m pytest main_snapshot_test.py
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from detect import MotionDetector
+
+
+def _make_task(snapshot_max_side: int) -> main.CameraTask:
+    config = {
+        "callback_url": "http://127.0.0.1:15123",
+        "snapshot_max_side": snapshot_max_side,
+    }
+    return main.CameraTask(
+        "cam",
+        rtsp_url="rtsp://camera/stream",
+        config=config,
+        detector=None,
+        motion_detector=MotionDetector(),
+    )
+
+
+def _detections():
+    return [
+        {
+            "label": "person",
+            "confidence": 0.9,
+            "box": {"x_min": 100, "y_min": 200, "x_max": 300, "y_max": 400},
+            "area": 40000,
+        }
+    ]
+
+
+def test_downscaled_snapshot_reuses_draw_buffer(monkeypatch):
+    sent = []
+    monkeypatch.setattr(
+        main, "send_callback", lambda cfg, route, p, **kw: sent.append(p)
+    )
+    task = _make_task(main.GLOBAL_CONFIG["snapshot_max_side"])
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+
+    task._encode_and_send(1, _detections(), frame.copy())
+    draw_buf = task._draw_buf
+    task._encode_and_send(2, _detections(), frame.copy())
+
+    # 分辨率不变时两次事件共用同一块缩小后的缓冲区
+    assert draw_buf is not None and task._draw_buf is draw_buf
+    payload = sent[-1]
+    assert (payload["snapshot_width"], payload["snapshot_height"]) == (1280, 720)
+    # 检测框换算到快照坐标，原检测结果不被修改
+    box = payload["detections"][0]["box"]
+    assert box == {"x_min": 67, "y_min": 133, "x_max": 200, "y_max": 267}
+
+
+def test_snapshot_max_side_zero_keeps_full_resolution(monkeypatch):
+    sent = []
+    monkeypatch.setattr(
+        main, "send_callback", lambda cfg, route, p, **kw: sent.append(p)
+    )
+    task = _make_task(0)
+    detections = _detections()
+
+    task._encode_and_send(1, detections, np.zeros((1080, 1920, 3), dtype=np.uint8))
+
+    assert task._draw_buf is None
+    assert (sent[-1]["snapshot_width"], sent[-1]["snapshot_height"]) == (1920, 1080)
+    assert sent[-1]["detections"] is detections
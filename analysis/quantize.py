@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+模型量化脚本 - 将 FP32 ONNX 模型转换为 INT8（CPU）或 FP16（GPU）模型
+使用方法:
+    python quantize.py <model.onnx> <source> [--output owl_int8.onnx] [--frames 100]
+    python quantize.py <model.onnx> --fp16 [--output owl_fp16.onnx]
+
+source 可以是图片目录、视频文件或 RTSP 地址，用于采集校准帧
+INT8 模型放在 FP32 模型同目录下命名为 owl_int8.onnx 时，CPU 推理会自动优先加载
+"""
+
+import argparse
+import os
+import sys
+from typing import Iterator
+
+import cv2
+import numpy as np
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from detect import ObjectDetector
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def iter_frames(source: str, limit: int) -> Iterator[np.ndarray]:
+    """从图片目录或视频流中读取至多 limit 帧 BGR 图像"""
+    if os.path.isdir(source):
+        names = sorted(n for n in os.listdir(source) if n.lower().endswith(IMAGE_EXTS))
+        for name in names[:limit]:
+            image = cv2.imread(os.path.join(source, name))
+            if image is not None:
+                yield image
+        return
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise RuntimeError(f"无法打开校准数据源: {source}")
+    try:
+        count = 0
+        while count < limit:
+            ok, image = cap.read()
+            if not ok:
+                break
+            count += 1
+            yield image
+    finally:
+        cap.release()
+
+
+def quantize_int8(model_path: str, source: str, output_path: str, frames: int):
+    """使用校准帧对模型做静态 INT8 量化（QOperator、U8S8、按通道权重量化）"""
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        QuantFormat,
+        QuantType,
+        quantize_static,
+    )
+
+    # 复用检测器的预处理，保证校准数据与线上推理输入一致
+    detector = ObjectDetector(model_path, device="cpu")
+    if not detector.load_model():
+        raise RuntimeError(f"模型加载失败: {model_path}")
+    input_name = detector.backend.input_name
+
+    class FrameDataReader(CalibrationDataReader):
+        def __init__(self):
+            self._frames = iter_frames(source, frames)
+            self.count = 0
+
+        def get_next(self):
+            image = next(self._frames, None)
+            if image is None:
+                return None
+            self.count += 1
+            # _preprocess 在 NCHW 分支返回新数组，可直接交给校准器
+            tensor = detector._preprocess(image).astype(np.float32, copy=False)
+            return {input_name: tensor}
+
+    reader = FrameDataReader()
+    quantize_static(
+        model_path,
+        output_path,
+        reader,
+        quant_format=QuantFormat.QOperator,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+    if reader.count == 0:
+        raise RuntimeError(f"未从 {source} 读取到校准帧")
+    print(f"INT8 模型已保存: {output_path} (校准帧: {reader.count})")
+
+
+def convert_fp16(model_path: str, output_path: str):
+    """将模型权重与计算转换为 FP16，供 CUDA 推理使用，输入输出保持 FP32"""
+    try:
+        import onnx
+        from onnxconverter_common import float16
+    except ImportError:
+        raise RuntimeError("FP16 转换需要安装 onnx 和 onnxconverter-common")
+
+    model = onnx.load(model_path)
+    model_fp16 = float16.convert_float_to_float16(model, keep_io_types=True)
+    onnx.save(model_fp16, output_path)
+    print(f"FP16 模型已保存: {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX 模型量化")
+    parser.add_argument("model", help="FP32 ONNX 模型路径")
+    parser.add_argument(
+        "source", nargs="?", help="校准数据：图片目录、视频文件或 RTSP 地址"
+    )
+    parser.add_argument("--output", help="输出模型路径，默认与输入同目录")
+    parser.add_argument("--frames", type=int, default=100, help="校准帧数")
+    parser.add_argument("--fp16", action="store_true", help="导出 FP16 模型（GPU）")
+    args = parser.parse_args()
+
+    base, _ = os.path.splitext(args.model)
+    if args.fp16:
+        convert_fp16(args.model, args.output or f"{base}_fp16.onnx")
+        return
+
+    if not args.source:
+        parser.error("INT8 量化需要指定校准数据源 source")
+    quantize_int8(
+        args.model, args.source, args.output or f"{base}_int8.onnx", args.frames
+    )
+
+
+if __name__ == "__main__":
+    main()